@@ -4,10 +4,16 @@ import glob
 import json
 import hashlib
 import requests
-import shutil
+import tempfile
 import sys
 import struct
 import time
+import mmap
+import bisect
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # --- KONFIGURATION ---
 SOURCE_DIR = "."         
@@ -15,6 +21,7 @@ OUTPUT_DIR = "mp3_converted"
 JSON_FILE = "tonies.json"
 HEADER_SIZE = 4096       
 OPUS_SAMPLE_RATE = 48000.0
+STREAM_CHUNK_SIZE = 64 * 1024 # 64KB Chunks
 
 # ==========================================
 # TEIL 1: ANALYSE-FUNKTIONEN (ROBUST)
@@ -59,23 +66,20 @@ def get_chapters_robust(filepath):
     return sorted(list(set([0] + best_chapters)))
 
 def scan_ogg_timestamps(filepath):
-    """Liest Zeitstempel aus OGG-Pages."""
+    """Liest Zeitstempel aus OGG-Pages (mmap + bytes.find statt Byte-für-Byte)."""
     page_map = {}
     try:
         with open(filepath, "rb") as f:
-            f.seek(HEADER_SIZE)
-            file_size = os.fstat(f.fileno()).st_size
-            while f.tell() < file_size:
-                pos = f.tell()
-                sig = f.read(4)
-                if sig != b'OggS':
-                    if not sig: break
-                    f.seek(pos + 1); continue
-                head = f.read(23)
-                if len(head) < 23: break
-                data = struct.unpack("<BBQLLLB", head)
-                page_map[data[4]] = data[2] 
-                f.seek(sum(f.read(data[6])), 1)
+            if os.fstat(f.fileno()).st_size <= HEADER_SIZE: return page_map
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = len(mm)
+                pos = mm.find(b'OggS', HEADER_SIZE)
+                while 0 <= pos and pos + 27 <= end:
+                    data = struct.unpack_from("<BBqLLLB", mm, pos + 4)
+                    body_start = pos + 27 + data[6]
+                    if body_start > end: break
+                    if data[2] >= 0: page_map[data[4]] = data[2]
+                    pos = mm.find(b'OggS', body_start + sum(mm[pos+27:body_start]))
     except: pass
     return page_map
 
@@ -126,21 +130,46 @@ def get_hash(path):
         return s.hexdigest().lower()
     except: return None
 
+_SESSION = None
+
+def http_session():
+    """Eine requests-Session pro Prozess (Keep-Alive statt neuer Verbindung pro Cover)."""
+    global _SESSION
+    if _SESSION is None: _SESSION = requests.Session()
+    return _SESSION
+
 def dl_cover(url, target):
+    """Lädt über eine eigene Temp-Datei und benennt erst danach um (parallel sicher)."""
+    tmp = None
     try:
-        r = requests.get(url, timeout=10)
+        r = http_session().get(url, timeout=10)
         if r.status_code == 200:
-            with open(target, 'wb') as f: f.write(r.content)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target) or ".", suffix=".part")
+            with os.fdopen(fd, 'wb') as f: f.write(r.content)
+            os.chmod(tmp, 0o644) # mkstemp legt 0600 an
+            os.replace(tmp, target)
             return True
     except: pass
+    if tmp and os.path.exists(tmp): os.remove(tmp)
     return False
 
 # ==========================================
 # TEIL 3: PROGRESS BAR FUNKTION
 # ==========================================
 
-def convert_audio_with_progress(audio_data, mp3_path, title, series, cover_path=None):
-    """Führt FFmpeg aus und zeigt einen Fortschrittsbalken basierend auf Input-Daten."""
+def part_path(path):
+    """Temporärer Name im selben Ordner (Endung bleibt, damit FFmpeg das Format erkennt)."""
+    folder, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f".{stem}.part{ext}")
+
+def convert_audio_with_progress(taf_path, mp3_path, title, series, cover_path=None, progress=None):
+    """
+    Führt FFmpeg aus und streamt die TAF blockweise hinein (konstanter Speicherbedarf).
+    Geschrieben wird in eine Temp-Datei, die nur bei Erfolg umbenannt wird -> ein
+    abgebrochener Lauf hinterlässt nie eine halbe MP3, die später als fertig gilt.
+    """
+    tmp_path = part_path(mp3_path)
     cmd = ['ffmpeg', '-y', '-f', 'ogg', '-i', 'pipe:0']
     
     if cover_path:
@@ -151,7 +180,7 @@ def convert_audio_with_progress(audio_data, mp3_path, title, series, cover_path=
     cmd += ['-c:a', 'libmp3lame', '-q:a', '2', 
             '-metadata', f'title={title}', 
             '-metadata', f'artist={series}', 
-            mp3_path]
+            tmp_path]
 
     # Prozess starten, stdin als Pipe
     process = subprocess.Popen(
@@ -161,42 +190,224 @@ def convert_audio_with_progress(audio_data, mp3_path, title, series, cover_path=
         stderr=subprocess.DEVNULL
     )
 
-    total_size = len(audio_data)
-    chunk_size = 64 * 1024 # 64KB Chunks
+    total_size = max(1, os.path.getsize(taf_path) - HEADER_SIZE)
+    buf = bytearray(STREAM_CHUNK_SIZE) # Ein Puffer für die ganze Datei
+    view = memoryview(buf)
     bytes_written = 0
+    last_percent = -1
 
     display_name = os.path.basename(mp3_path)
     
     try:
-        # Daten stückweise schreiben
-        for i in range(0, total_size, chunk_size):
-            chunk = audio_data[i:i+chunk_size]
-            process.stdin.write(chunk)
-            bytes_written += len(chunk)
-            
-            # Prozent berechnen
-            percent = int((bytes_written / total_size) * 100)
-            
-            # Ausgabe auf gleicher Zeile (\r)
-            sys.stdout.write(f"\r  -> Audio: {display_name} ... {percent}%")
-            sys.stdout.flush()
+        with open(taf_path, "rb") as src:
+            src.seek(HEADER_SIZE)
+            # Daten stückweise schreiben (readinto + memoryview, keine Kopien)
+            while True:
+                n = src.readinto(buf)
+                if not n: break
+                process.stdin.write(view[:n])
+                bytes_written += n
+                
+                # Prozent berechnen
+                percent = int((bytes_written / total_size) * 100)
+                if percent == last_percent: continue
+                last_percent = percent
+                
+                if progress:
+                    # Parallel-Modus: Zeile des Workers aktualisieren
+                    progress(f"{display_name} ... {percent}%")
+                else:
+                    # Ausgabe auf gleicher Zeile (\r)
+                    sys.stdout.write(f"\r  -> Audio: {display_name} ... {percent}%")
+                    sys.stdout.flush()
             
         process.stdin.close()
         process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"FFmpeg Exit-Code {process.returncode}")
+        os.replace(tmp_path, mp3_path)
         
         # Zeile abschließen mit Haken
-        sys.stdout.write(f"\r  -> Audio: {display_name} ✓          \n")
-        sys.stdout.flush()
+        if progress:
+            progress(f"{display_name} ✓")
+        else:
+            sys.stdout.write(f"\r  -> Audio: {display_name} ✓          \n")
+            sys.stdout.flush()
         return True
     except Exception as e:
-        print(f"\n  ✗ Fehler bei FFmpeg: {e}")
+        if process.poll() is None: process.kill(); process.wait()
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        if progress: progress(f"{display_name} ✗")
+        else: print(f"\n  ✗ Fehler bei FFmpeg: {e}")
         return False
 
 # ==========================================
-# TEIL 4: HAUPTPROGRAMM
+# TEIL 4: PARALLELE VERARBEITUNG
+# ==========================================
+
+# Wird im Worker-Prozess durch _init_worker gesetzt
+_WORKER_SLOT = None
+_PROGRESS_QUEUE = None
+_WORKER_DB = {}
+
+def _init_worker(slot_queue, progress_queue, db):
+    """Jeder Worker bekommt eine feste Zeile im ProgressBoard und die Datenbank."""
+    global _WORKER_SLOT, _PROGRESS_QUEUE, _WORKER_DB
+    _WORKER_SLOT = slot_queue.get()
+    _PROGRESS_QUEUE = progress_queue
+    _WORKER_DB = db
+
+def _worker_progress(text):
+    if _PROGRESS_QUEUE is not None:
+        _PROGRESS_QUEUE.put(('line', _WORKER_SLOT, text))
+
+class ProgressBoard:
+    """
+    Zeichnet eine Fortschrittszeile pro Worker (ANSI) am Ende der Ausgabe.
+    Log-Meldungen werden oberhalb der Zeilen eingeschoben.
+    """
+    def __init__(self, slots, queue):
+        self.lines = [""] * slots
+        self.queue = queue
+        self.thread = None
+
+    def start(self):
+        if os.name == 'nt': os.system("")  # ANSI in der Windows-Konsole aktivieren
+        sys.stdout.write("\n" * len(self.lines))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def log(self, text):
+        self.queue.put(('log', None, text))
+
+    def stop(self):
+        self.queue.put(None)
+        if self.thread: self.thread.join()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None: break
+            kind, slot, text = item
+            out = f"\x1b[{len(self.lines)}F"
+            if kind == 'log': out += f"\x1b[2K{text}\n"
+            else: self.lines[slot] = f"  [W{slot+1}] {text}"
+            out += "".join(f"\x1b[2K{line}\n" for line in self.lines)
+            sys.stdout.write(out)
+            sys.stdout.flush()
+
+def assign_names(taf_files, hashes, db):
+    """
+    Zielnamen in Dateireihenfolge vergeben (im Hauptprozess, bevor Worker starten).
+    Gleiche Titel (Re-Dumps, Backups) bekommen ' (<Dateiname>)' angehängt, damit nie
+    zwei Worker in dieselbe MP3/CUE schreiben.
+    """
+    used = set(); names = []
+    for taf_path, file_hash in zip(taf_files, hashes):
+        stem = os.path.splitext(os.path.basename(taf_path))[0]
+        name = clean_filename(db.get(file_hash, {}).get('title', stem)) or stem
+        if name in used: name = f"{name} ({stem})"
+        used.add(name); names.append(name)
+    return names
+
+def process_taf(taf_path, db, log=print, progress=None, file_hash=None, final_name=None):
+    """Hash, Cover, Audio und CUE für eine einzelne TAF-Datei."""
+    filename = os.path.basename(taf_path)
+    original_base = os.path.splitext(filename)[0]
+
+    # A) Metadaten ermitteln
+    if file_hash is None: file_hash = get_hash(taf_path)
+    meta = db.get(file_hash, {})
+    
+    title = meta.get('title', original_base)
+    series = meta.get('series', title)
+    track_names = meta.get('tracks', [])
+    
+    if final_name is None: final_name = clean_filename(title)
+    log(f"  -> Ziel: '{final_name}'")
+    
+    # Pfade
+    mp3_path = os.path.join(OUTPUT_DIR, f"{final_name}.mp3")
+    cue_path = os.path.join(OUTPUT_DIR, f"{final_name}.cue")
+    jpg_path = os.path.join(OUTPUT_DIR, f"{final_name}.jpg")
+
+    # B) Cover laden (direkt ins Ziel, keine geteilte Temp-Datei für parallele Worker)
+    has_cover = False
+    
+    # Prüfen ob Cover schon da ist
+    if os.path.exists(jpg_path):
+        log(f"  -> Cover: {os.path.basename(jpg_path)} (Existiert bereits) ✓")
+        has_cover = True
+    elif meta.get('pic'):
+        if dl_cover(meta['pic'], jpg_path): 
+            has_cover = True
+            log(f"  -> Cover: {os.path.basename(jpg_path)} ✓")
+
+    # C) Audio Konvertierung (mit Progress Bar)
+    if not os.path.exists(mp3_path):
+        try:
+            # Rufe die neue Funktion mit Fortschrittsanzeige auf
+            if not convert_audio_with_progress(taf_path, mp3_path, title, series, jpg_path if has_cover else None, progress):
+                log(f"  ✗ Audio Fehler: {os.path.basename(mp3_path)} nicht erstellt")
+            
+        except Exception as e:
+            log(f"  ✗ Audio Fehler: {e}")
+    else:
+        log(f"  -> Audio: {os.path.basename(mp3_path)} (Existiert bereits) ✓")
+
+    # D) CUE Sheet
+    chapters = get_chapters_robust(taf_path)
+    
+    if chapters and len(chapters) > 1:
+        page_map = scan_ogg_timestamps(taf_path)
+        known_pages = sorted(page_map)
+        try:
+            with open(cue_path, "w", encoding="utf-8") as f:
+                f.write(f'REM CREATED BY TAF2MP3 DETAIL\n')
+                f.write(f'TITLE "{title}"\nPERFORMER "{series}"\n')
+                f.write(f'FILE "{os.path.basename(mp3_path)}" MP3\n')
+                
+                track_no = 1
+                for page_idx in chapters:
+                    time_str = "00:00:00"
+                    if page_idx > 0:
+                        # Letzte bekannte Page vor dem Kapitel (binäre Suche)
+                        pos = bisect.bisect_left(known_pages, page_idx)
+                        if pos > 0:
+                            time_str = granule_to_cue(page_map[known_pages[pos - 1]])
+                    
+                    t_name = f"Chapter {track_no}"
+                    if track_no <= len(track_names): t_name = track_names[track_no-1]
+                    
+                    f.write(f'  TRACK {track_no:02d} AUDIO\n')
+                    f.write(f'    TITLE "{t_name}"\n')
+                    f.write(f'    INDEX 01 {time_str}\n')
+                    track_no += 1
+            
+            log(f"  -> CUE Sheet: {os.path.basename(cue_path)} ✓ ({len(chapters)} Tracks)")
+        except Exception as e: 
+            log(f"  ✗ CUE Fehler: {e}")
+    else:
+        log("  ✗ CUE Sheet: Keine Kapitel gefunden.")
+
+def _process_taf_worker(taf_path, file_hash, final_name):
+    logs = []
+    process_taf(taf_path, _WORKER_DB, logs.append, _worker_progress, file_hash, final_name)
+    return logs
+
+# ==========================================
+# TEIL 5: HAUPTPROGRAMM
 # ==========================================
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TAF 2 MP3 DETAIL (Info & Progress)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Anzahl paralleler Worker (Standard: Anzahl CPU-Kerne)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
     print("=" * 70)
     print("TAF 2 MP3 DETAIL (Info & Progress)".center(70))
     print("=" * 70)
@@ -218,98 +429,36 @@ def main():
 
     db = load_json_db(JSON_FILE)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    jobs = max(1, min(args.jobs, len(taf_files)))
 
-    for i, taf_path in enumerate(taf_files, 1):
-        filename = os.path.basename(taf_path)
-        original_base = os.path.splitext(filename)[0]
-        
-        print(f"[{i}/{len(taf_files)}] Lade: {filename}")
-        
-        # A) Metadaten ermitteln
-        file_hash = get_hash(taf_path)
-        meta = db.get(file_hash, {})
-        
-        title = meta.get('title', original_base)
-        series = meta.get('series', title)
-        track_names = meta.get('tracks', [])
-        
-        final_name = clean_filename(title)
-        print(f"  -> Ziel: '{final_name}'")
-        
-        # Pfade
-        mp3_path = os.path.join(OUTPUT_DIR, f"{final_name}.mp3")
-        cue_path = os.path.join(OUTPUT_DIR, f"{final_name}.cue")
-        jpg_path = os.path.join(OUTPUT_DIR, f"{final_name}.jpg")
-
-        # B) Cover laden
-        cover_tmp = "temp_cover.jpg"
-        has_cover = False
-        
-        # Prüfen ob Cover schon da ist
-        if os.path.exists(jpg_path):
-            print(f"  -> Cover: {os.path.basename(jpg_path)} (Existiert bereits) ✓")
-            has_cover = True
-            shutil.copy(jpg_path, cover_tmp) # Für FFmpeg bereitstellen
-        elif meta.get('pic'):
-            if dl_cover(meta['pic'], cover_tmp): 
-                has_cover = True
-                shutil.copy(cover_tmp, jpg_path)
-                print(f"  -> Cover: {os.path.basename(jpg_path)} ✓")
-
-        # C) Audio Konvertierung (mit Progress Bar)
-        if not os.path.exists(mp3_path):
-            try:
-                with open(taf_path, "rb") as f:
-                    f.seek(HEADER_SIZE)
-                    audio_data = f.read()
-                
-                # Rufe die neue Funktion mit Fortschrittsanzeige auf
-                convert_audio_with_progress(audio_data, mp3_path, title, series, cover_tmp if has_cover else None)
-                
-            except Exception as e:
-                print(f"  ✗ Audio Fehler: {e}")
-        else:
-            print(f"  -> Audio: {os.path.basename(mp3_path)} (Existiert bereits) ✓")
-
-        # D) CUE Sheet
-        chapters = get_chapters_robust(taf_path)
-        
-        if chapters and len(chapters) > 1:
-            page_map = scan_ogg_timestamps(taf_path)
-            try:
-                with open(cue_path, "w", encoding="utf-8") as f:
-                    f.write(f'REM CREATED BY TAF2MP3 DETAIL\n')
-                    f.write(f'TITLE "{title}"\nPERFORMER "{series}"\n')
-                    f.write(f'FILE "{os.path.basename(mp3_path)}" MP3\n')
-                    
-                    track_no = 1
-                    for page_idx in chapters:
-                        time_str = "00:00:00"
-                        if page_idx > 0:
-                            prev = page_idx - 1
-                            tries = 100
-                            while prev >= 0 and prev not in page_map and tries > 0:
-                                prev -= 1; tries -= 1
-                            if prev in page_map:
-                                time_str = granule_to_cue(page_map[prev])
-                        
-                        t_name = f"Chapter {track_no}"
-                        if track_no <= len(track_names): t_name = track_names[track_no-1]
-                        
-                        f.write(f'  TRACK {track_no:02d} AUDIO\n')
-                        f.write(f'    TITLE "{t_name}"\n')
-                        f.write(f'    INDEX 01 {time_str}\n')
-                        track_no += 1
-                
-                print(f"  -> CUE Sheet: {os.path.basename(cue_path)} ✓ ({len(chapters)} Tracks)")
-            except Exception as e: 
-                print(f"  ✗ CUE Fehler: {e}")
-        else:
-            print("  ✗ CUE Sheet: Keine Kapitel gefunden.")
-
-        # Cleanup
-        if os.path.exists(cover_tmp): os.remove(cover_tmp)
-        print() # Leerzeile
+    if jobs == 1:
+        hashes = [get_hash(p) for p in taf_files]
+        names = assign_names(taf_files, hashes, db)
+        for i, taf_path in enumerate(taf_files, 1):
+            print(f"[{i}/{len(taf_files)}] Lade: {os.path.basename(taf_path)}")
+            process_taf(taf_path, db, file_hash=hashes[i-1], final_name=names[i-1])
+            print() # Leerzeile
+    else:
+        print(f"⚙️  Starte {jobs} Worker...")
+        manager = multiprocessing.Manager()
+        slot_queue = manager.Queue()
+        for slot in range(jobs): slot_queue.put(slot)
+        progress_queue = manager.Queue()
+        board = ProgressBoard(jobs, progress_queue)
+        board.start()
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(slot_queue, progress_queue, db)) as pool:
+            # Hashes parallel, Namen danach im Hauptprozess: gleiche Titel werden eindeutig
+            hashes = list(pool.map(get_hash, taf_files))
+            names = assign_names(taf_files, hashes, db)
+            futures = {pool.submit(_process_taf_worker, p, h, n): p for p, h, n in zip(taf_files, hashes, names)}
+            for fut in as_completed(futures):
+                board.log(f"[{taf_files.index(futures[fut]) + 1}/{len(taf_files)}] {os.path.basename(futures[fut])}")
+                try: logs = fut.result()
+                except Exception as e: logs = [f"  ✗ Fehler: {e}"]
+                for line in logs: board.log(line)
+        board.stop()
+        manager.shutdown()
 
     print("=" * 70)
     print("Fertig! Alle Dateien befinden sich in:")
@@ -0,0 +1,332 @@
+import os
+import sys
+import json
+import time
+import glob
+import random
+import shutil
+import struct
+import hashlib
+import platform
+import argparse
+import tempfile
+import subprocess
+
+# Das Haupt-Script liegt im selben Ordner und wird als Modul benutzt
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import taf_jukebox_final as tj
+
+# --- KONFIGURATION ---
+RESULTS_FILE = "taf_bench_results.jsonl" # Eine JSON-Zeile pro Lauf -> Vergleich über Versionen
+PAGE_SIZE = 4096            # Toniebox-TAFs füllen jede OGG-Page auf 4 KB auf
+GRANULE_STEP = 960 * 17     # Samples pro Audio-Page (~0,34 s bei 48 kHz)
+OGG_SERIAL = 0x544F4E49
+REGRESSION_THRESHOLD = 0.10 # Ab 10% weniger Durchsatz als beim letzten Lauf wird gewarnt
+
+# ==========================================
+# TEIL 1: SYNTHETISCHE TAF-DATEIEN
+# ==========================================
+
+def ogg_page(seq, granule, payload, header_type=0, serial=OGG_SERIAL):
+    """Eine OGG-Page mit Segment-Tabelle und korrekter CRC."""
+    segs = [255] * (len(payload) // 255) + [len(payload) % 255]
+    page = bytearray(b'OggS' + struct.pack("<BBqLLLB", 0, header_type, granule, serial, seq, 0, len(segs)))
+    page += bytes(segs) + payload
+    struct.pack_into("<L", page, 22, tj.ogg_crc(bytes(page)))
+    return bytes(page)
+
+def _payload_for(page_size):
+    """Payload-Länge, mit der eine Page genau `page_size` Byte groß wird."""
+    for n in range(page_size - 27, 0, -1):
+        if 27 + n // 255 + 1 + n == page_size: return n
+    raise ValueError(f"Keine Page mit {page_size} Byte möglich")
+
+def make_taf(path, minutes=30.0, chapters=10, seed=0):
+    """
+    Schreibt eine gültige TAF: Protobuf-Header (4 KB) + OpusHead/OpusTags + Audio-Pages
+    zu je 4 KB mit zufälligem Inhalt. Kapitel starten gleichmäßig verteilt.
+    Gibt (SHA-1, Anzahl Pages) zurück.
+    """
+    rng = random.Random(seed)
+    n_audio = max(1, int(minutes * 60 * tj.OPUS_SAMPLE_RATE) // GRANULE_STEP)
+    head = b'OpusHead' + struct.pack("<BBHIhB", 1, 2, 312, 48000, 0, 0)
+    first = ogg_page(0, 0, head, header_type=2)
+    # OpusTags wird so aufgefüllt, dass das Audio an einer 4-KB-Grenze beginnt
+    vendor = b"taf_bench"
+    tags = b'OpusTags' + struct.pack("<L", len(vendor)) + vendor + struct.pack("<L", 0)
+    tags += b'\0' * (_payload_for(PAGE_SIZE - len(first)) - len(tags))
+    body = [first, ogg_page(1, 0, tags)]
+    size = _payload_for(PAGE_SIZE); granule = 0
+    for i in range(n_audio):
+        granule += GRANULE_STEP
+        # 'O' vermeiden, damit kein zufälliges 'OggS' im Payload landet
+        payload = rng.randbytes(size).replace(b'O', b'o')
+        body.append(ogg_page(i + 2, granule, payload, header_type=4 if i == n_audio - 1 else 0))
+    audio = b"".join(body)
+    sha1 = hashlib.sha1(audio).hexdigest()
+    chapter_pages = [2 + k * n_audio // max(1, chapters) for k in range(max(1, chapters))]
+    chapter_pages[0] = 0
+    with open(path, "wb") as f:
+        f.write(tj.build_taf_header(sha1, len(audio), 1600000000 + seed, chapter_pages))
+        f.write(audio)
+    return sha1, n_audio + 2
+
+def write_db(path, hashes):
+    """Passende tonies.json (V2) für die erzeugten Dateien, damit der E2E-Lauf ohne Netzwerk auskommt."""
+    data = [{"article": f"bench-{i}", "data": [{
+        "series": "Benchmark", "episode": f"Folge {i+1}", "ids": [{"hash": h}],
+        "runtime": 30, "tracks": [f"Kapitel {k+1}" for k in range(3)]}]}
+        for i, h in enumerate(hashes)]
+    with open(path, "w", encoding="utf-8") as f: json.dump(data, f)
+
+STUB_FFMPEG = r'''
+import sys
+# Stub-FFmpeg: liest stdin komplett, schreibt eine kleine Ausgabedatei, meldet Fortschritt
+args = sys.argv[1:]
+n = 0
+if 'pipe:0' in args:
+    while True:
+        chunk = sys.stdin.buffer.read(65536)
+        if not chunk: break
+        n += len(chunk)
+out = args[-1]
+if '%' in out: out = out % 1
+with open(out, 'wb') as f: f.write(b'STUB' + n.to_bytes(8, 'little'))
+if 'pipe:1' in args: print("progress=end", flush=True)
+'''
+
+def install_stub_ffmpeg(bin_dir):
+    os.makedirs(bin_dir, exist_ok=True)
+    script = os.path.join(bin_dir, "ffmpeg")
+    with open(script, "w", encoding="utf-8") as f: f.write(f"#!{sys.executable}\n" + STUB_FFMPEG)
+    os.chmod(script, 0o755)
+    with open(script + ".bat", "w", encoding="utf-8") as f: f.write(f'@"{sys.executable}" "%~dp0ffmpeg" %*\n')
+
+# ==========================================
+# TEIL 2: BENCHMARKS
+# ==========================================
+
+def best_of(repeat, func, setup=None):
+    """Schnellste von `repeat` Messungen (Sekunden) – robust gegen Ausreißer."""
+    best = None
+    for _ in range(repeat):
+        if setup: setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def result(seconds, size=0, pages=0, ops=0):
+    r = {'seconds': round(seconds, 6)}
+    if size: r['mb_s'] = round(size / seconds / 1e6, 2)
+    if pages: r['pages_s'] = round(pages / seconds, 1)
+    if ops: r['ops_s'] = round(ops / seconds, 1)
+    return r
+
+def _drop_sidecars(paths):
+    for p in paths:
+        if os.path.exists(tj._sidecar_path(p)): os.remove(tj._sidecar_path(p))
+
+def run_micro(files, pages, repeat):
+    """Einzelne Hot Paths des Haupt-Scripts auf den erzeugten Dateien."""
+    tj.WRITE_PAGE_INDEX = False  # Sonst misst der zweite Lauf nur das Laden des Sidecars
+    _drop_sidecars(files)
+    size = sum(os.path.getsize(f) for f in files)
+    results = {}
+
+    varints = b"".join(tj.write_varint(v) for v in range(0, 1 << 21, 21))
+    n_varints = len(range(0, 1 << 21, 21))
+    def varint_loop():
+        pos = 0; read = tj.read_varint; end = len(varints)
+        while pos < end: _v, pos = read(varints, pos)
+    results['read_varint'] = result(best_of(repeat, varint_loop), ops=n_varints)
+
+    def chapters_loop():
+        for _ in range(200):
+            for f in files: tj.get_chapters_robust(f)
+    results['get_chapters_robust'] = result(best_of(repeat, chapters_loop), ops=200 * len(files))
+
+    results['get_hash'] = result(best_of(repeat, lambda: [tj.get_hash(f) for f in files]), size)
+    results['scan_ogg_timestamps'] = result(best_of(repeat, lambda: [tj.scan_ogg_timestamps(f) for f in files]),
+                                            size, pages)
+
+    def index_scan():
+        for f in files:
+            with open(f, "rb") as fh: tj.OggPageIndex.scan(fh.read())
+    results['OggPageIndex.scan'] = result(best_of(repeat, index_scan), size, pages)
+    results['verify_taf'] = result(best_of(repeat, lambda: [tj.verify_taf(f) for f in files]), size, pages)
+
+    def tee_feed():
+        # Analyse im Encode-Stream (--trust-header-hash): Blöcke wie aus convert_audio_with_progress
+        for f in files:
+            taf = tj.TafFile(f)
+            with open(f, "rb") as fh:
+                taf.begin(fh.read(tj.HEADER_SIZE))
+                for chunk in iter(lambda: fh.read(tj.STREAM_CHUNK_SIZE), b""): taf.feed(chunk)
+            taf.finish()
+    results['TafFile.feed'] = result(best_of(repeat, tee_feed), size, pages)
+
+    granules = list(range(0, 48000 * 3600, 48000 * 3600 // 100000))
+    results['granule_to_cue'] = result(best_of(repeat, lambda: [tj.granule_to_cue(g) for g in granules]),
+                                       ops=len(granules))
+
+    db_json = [{"article": f"a{i}", "data": [{"series": f"S{i}", "episode": "E",
+               "ids": [{"hash": hashlib.sha1(str((i, k)).encode()).hexdigest()} for k in range(3)]}]}
+               for i in range(5000)]
+    results['normalize_db'] = result(best_of(repeat, lambda: tj.normalize_db(db_json)), ops=len(db_json))
+
+    # Fingerprint-Abgleich unbekannter TAFs gegen eine DB mit realistisch verteilten Laufzeiten
+    rng = random.Random(1)
+    for entry in (item["data"][0] for item in db_json):
+        entry["runtime"] = rng.randint(10, 90); entry["tracks"] = [f"T{k}" for k in range(rng.randint(1, 20))]
+    db = tj.ToniesDb(":memory:"); db.load(db_json)
+    tafs = [tj.analyze_taf(f) for f in files]
+    results['match_fingerprint'] = result(best_of(repeat, lambda: [tj.match_fingerprint(t, db) for t in tafs]),
+                                          ops=len(tafs))
+    db.close()
+
+    texts = [(f"Serie {i} - Folge {i}", "Ein Abenteuer mit Piraten, Drachen und einem kleinen Hund " * 4, "Hörspiel")
+             for i in range(2000)]
+    results['detect_tags'] = result(best_of(repeat, lambda: [tj.detect_tags(*t) for t in texts]), ops=len(texts))
+    # Große Taxonomie (500 Kategorien x 10 Keywords), wie aus einer taxonomy.json geladen
+    taxonomy = {f"Kategorie {c}": [hashlib.md5(f"{c}/{k}".encode()).hexdigest()[:7] for k in range(10)] for c in range(500)}
+    taxonomy["Abenteuer"] = ["pirat", "drache", "abenteuer"]
+    tagger = tj.Tagger(taxonomy)
+    results['Tagger (5000 Keywords)'] = result(best_of(repeat, lambda: [tagger.tag(*t) for t in texts]), ops=len(texts))
+    return results
+
+def run_e2e(workdir, files, hashes, pages, repeat, jobs, fmt):
+    """Kompletter Lauf des Haupt-Scripts (Analyse, Katalog, Encode mit Stub-FFmpeg) ohne Netzwerk."""
+    bin_dir = os.path.join(workdir, "bin")
+    install_stub_ffmpeg(bin_dir)
+    write_db(os.path.join(workdir, tj.JSON_FILE), hashes)
+    env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""))
+    script = os.path.abspath(tj.__file__)
+    size = sum(os.path.getsize(f) for f in files)
+    report = os.path.join(workdir, "report.json")
+    cmd = [sys.executable, script, "--offline", "--no-cache", "-j", str(jobs), "--format", fmt, "--report", report]
+
+    def reset():
+        # Jeder Lauf startet kalt: keine Ausgaben, kein Sidecar, keine DB-Kopie
+        shutil.rmtree(os.path.join(workdir, tj.OUTPUT_DIR), ignore_errors=True)
+        _drop_sidecars(files)
+        for name in (tj.DB_CACHE_FILE, tj.CACHE_FILE):
+            if os.path.exists(os.path.join(workdir, name)): os.remove(os.path.join(workdir, name))
+
+    def run():
+        proc = subprocess.run(cmd, cwd=workdir, env=env, input=b"\n", capture_output=True)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stdout.decode(errors='replace')[-2000:] + proc.stderr.decode(errors='replace')[-2000:])
+
+    r = result(best_of(repeat, run, reset), size, pages)
+    with open(os.path.join(workdir, tj.OUTPUT_DIR, "jukebox.json"), encoding="utf-8") as f:
+        if len(json.load(f)) != len(files): raise RuntimeError("jukebox.json unvollständig")
+    with open(report, encoding="utf-8") as f:
+        r['stages'] = {s['stage']: s['seconds'] for s in json.load(f)['stages']}
+    return {f"e2e_{fmt}_j{jobs}": r}
+
+# ==========================================
+# TEIL 3: ERGEBNISSE & VERGLEICH
+# ==========================================
+
+def code_version():
+    try:
+        out = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unbekannt"
+    except: return "unbekannt"
+
+def load_previous(path, params):
+    """Letzter gespeicherter Lauf mit denselben Parametern."""
+    previous = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try: run = json.loads(line)
+                except ValueError: continue
+                if run.get('params') == params: previous = run
+    except FileNotFoundError: pass
+    return previous
+
+def _throughput(r):
+    return r.get('mb_s') or r.get('pages_s') or r.get('ops_s')
+
+def print_results(results, previous, threshold):
+    """Tabelle mit Durchsatz; gibt die Namen der Benchmarks mit Regression zurück."""
+    regressions = []
+    print(f"\n{'Benchmark':<24} {'Zeit':>10} {'MB/s':>9} {'Pages/s':>11} {'Ops/s':>12}  Vergleich")
+    for name, r in results.items():
+        line = f"{name:<24} {r['seconds']:>9.4f}s {r.get('mb_s', ''):>9} {r.get('pages_s', ''):>11} {r.get('ops_s', ''):>12}"
+        old = (previous or {}).get('results', {}).get(name)
+        if old and _throughput(old) and _throughput(r):
+            change = _throughput(r) / _throughput(old) - 1
+            line += f"  {change:+.1%}"
+            if change < -threshold:
+                line += " ⚠️"; regressions.append(name)
+        print(line)
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks für taf_jukebox_final.py mit synthetischen TAF-Dateien")
+    parser.add_argument("--files", type=int, default=4, help="Anzahl erzeugter TAF-Dateien")
+    parser.add_argument("--minutes", type=float, default=30.0, help="Länge pro Datei in Minuten")
+    parser.add_argument("--chapters", type=int, default=10, help="Kapitel pro Datei")
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen pro Messung (die schnellste zählt)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker für den E2E-Lauf")
+    parser.add_argument("--format", choices=sorted(tj.OUTPUT_FORMATS), default=tj.OUTPUT_FORMAT,
+                        help="Ausgabeformat für den E2E-Lauf")
+    parser.add_argument("--only", choices=("micro", "e2e"), help="Nur Micro- oder nur End-to-End-Benchmarks")
+    parser.add_argument("--results", default=RESULTS_FILE, help="Ergebnisdatei (JSON-Zeilen)")
+    parser.add_argument("--no-save", action="store_true", help="Ergebnis nicht speichern")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Erlaubter Durchsatz-Verlust gegenüber dem letzten Lauf (0.1 = 10%%)")
+    parser.add_argument("--check", action="store_true", help="Exit-Code 1 bei Regression (für CI)")
+    parser.add_argument("--keep", metavar="ORDNER", help="Erzeugte Dateien in ORDNER behalten statt in einem Temp-Ordner")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {'files': args.files, 'minutes': args.minutes, 'chapters': args.chapters,
+              'jobs': args.jobs, 'format': args.format, 'only': args.only}
+
+    workdir = args.keep or tempfile.mkdtemp(prefix="taf_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        print(f"🧪 Erzeuge {args.files} TAF-Dateien à {args.minutes:g} min, {args.chapters} Kapitel in {workdir}...")
+        files = []; hashes = []; pages = 0
+        for i in range(args.files):
+            path = os.path.join(workdir, f"bench_{i:02d}.taf")
+            sha1, n = make_taf(path, args.minutes, args.chapters, seed=i)
+            files.append(path); hashes.append(sha1); pages += n
+        size = sum(os.path.getsize(f) for f in files)
+        print(f"   {size / 1e6:.1f} MB, {pages} Pages")
+
+        results = {}
+        if args.only != "e2e":
+            print("⏱️  Micro-Benchmarks...")
+            results.update(run_micro(files, pages, args.repeat))
+        if args.only != "micro":
+            print(f"⏱️  End-to-End ({args.format}, {args.jobs} Worker, Stub-FFmpeg)...")
+            results.update(run_e2e(workdir, files, hashes, pages, args.repeat, args.jobs, args.format))
+    finally:
+        if not args.keep: shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            for f in glob.glob(os.path.join(workdir, "*.pidx")): os.remove(f)
+
+    previous = load_previous(args.results, params)
+    regressions = print_results(results, previous, args.threshold)
+    if previous: print(f"\nVergleich mit {previous['version']} vom {previous['date']}")
+
+    run = {'date': time.strftime("%Y-%m-%d %H:%M:%S"), 'version': code_version(),
+           'python': platform.python_version(), 'platform': platform.platform(),
+           'params': params, 'results': results}
+    if not args.no_save:
+        with open(args.results, "a", encoding="utf-8") as f: f.write(json.dumps(run, ensure_ascii=False) + "\n")
+        print(f"💾 Gespeichert in {args.results}")
+    if regressions:
+        print(f"⚠️  Langsamer als beim letzten Lauf: {', '.join(regressions)}")
+        if args.check: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -3,33 +3,98 @@ import subprocess
 import glob
 import json
 import hashlib
+import zlib
 import requests
+from requests.adapters import HTTPAdapter
 import shutil
+import tempfile
 import sys
 import struct
 import time
+import mmap
+import bisect
+from array import array
 import re
+import argparse
+import csv
+import importlib.util
+import sqlite3
+import asyncio
+from collections import namedtuple, deque
+import threading
+import queue
+import select
+import signal
+import socket
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 
-# Versuch, Playwright zu laden (für die Beschreibungen)
-try:
-    from playwright.sync_api import sync_playwright
-    from bs4 import BeautifulSoup
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
-    print("⚠️  Warnung: Playwright nicht gefunden. Beschreibungen werden nicht live geladen.")
+# Playwright (Browser-Fallback für Beschreibungen) wird erst bei Bedarf importiert
+PLAYWRIGHT_AVAILABLE = all(importlib.util.find_spec(m) for m in ("playwright", "bs4"))
+# Worker-Prozesse importieren das Modul erneut -> Warnung nur im Hauptprozess
+if not PLAYWRIGHT_AVAILABLE and __name__ == "__main__":
+    print("⚠️  Warnung: Playwright nicht gefunden. Beschreibungen werden nur per HTTP geladen.")
     print("   Bitte installieren: pip install playwright beautifulsoup4 && playwright install")
 
 # --- KONFIGURATION ---
 SOURCE_DIR = "."         
 OUTPUT_DIR = "jukebox_output"
 JSON_FILE = "tonies.json" # Fallback Datei
+CACHE_FILE = ".taf_cache.sqlite" # Analyse- & Metadaten-Cache (im SOURCE_DIR)
+DB_CACHE_FILE = ".tonies_db.sqlite" # Offline-Kopie der Tonie-DB als Hash-Index (im SOURCE_DIR)
+DB_REFRESH_INTERVAL = 6 * 3600 # Sekunden, in denen die DB-Kopie ohne Netzwerk benutzt wird
+SCRAPE_CONCURRENCY = 4 # Parallele Browser-Kontexte beim Scrapen (Fallback)
+SCRAPE_HTTP_WORKERS = 8 # Parallele HTTP-Abrufe beim Scrapen (schneller Weg) = Netzwerk-Limit der Pipeline
+PIPELINE_QUEUE_SIZE = 8 # Puffer zwischen den Pipeline-Stufen (Metadaten -> Cover -> Encode)
+COVER_CACHE_DIR = ".cover_cache" # Cover-Ablage nach URL-Hash (im SOURCE_DIR)
+COVER_WORKERS = 8 # Parallele Cover-Downloads
+OUTPUT_FORMAT = "mp3" # mp3 (Neu-Encode) oder opus / ogg / m4a (Opus-Pakete 1:1 übernommen)
+
+# Ausgabeformate: Dateiendung, Audio-Codec-Argumente, ob ein Cover eingebettet werden kann
+# (muxer = Containerformat, explizit per -f bzw. für den Segment-Muxer bei --split-chapters)
+OUTPUT_FORMATS = {
+    'mp3':  {'ext': '.mp3',  'audio': ['-c:a', 'libmp3lame', '-q:a', '2'], 'cover': True,  'cue_type': 'MP3',  'muxer': 'mp3'},
+    'opus': {'ext': '.opus', 'audio': ['-c:a', 'copy'],                    'cover': False, 'cue_type': 'WAVE', 'muxer': 'opus'},
+    'ogg':  {'ext': '.ogg',  'audio': ['-c:a', 'copy'],                    'cover': False, 'cue_type': 'WAVE', 'muxer': 'ogg'},
+    'm4a':  {'ext': '.m4a',  'audio': ['-c:a', 'copy', '-strict', 'experimental'], 'cover': True, 'cue_type': 'WAVE', 'muxer': 'mp4'},  # Opus in MP4 (der ipod-Muxer für .m4a kennt kein Opus)
+}
+# Zusätzliche Ausgabe-Profile (--profile NAME, mehrfach möglich), z.B. für alte Geräte mit wenig Speicher.
+# Jedes Profil bekommt einen eigenen Ordner (<OUTPUT_DIR>_<name>) mit eigener jukebox.json; alle Profile
+# entstehen aus EINEM Lesen/Decode der TAF (ein FFmpeg-Aufruf mit mehreren Ausgaben).
+# format = Basis aus OUTPUT_FORMATS; bitrate / channels / sample_rate erzwingen einen Neu-Encode.
+OUTPUT_PROFILES = {
+    'klein': {'format': 'mp3', 'bitrate': '64k', 'channels': 1, 'sample_rate': 22050},
+    'mini':  {'format': 'mp3', 'bitrate': '32k', 'channels': 1, 'sample_rate': 22050},
+    'opus':  {'format': 'ogg', 'bitrate': '24k', 'channels': 1},
+}
+SCRAPE_TTL = 30 * 24 * 3600 # Sekunden, die eine gescrapte Produktseite gültig bleibt
 HEADER_SIZE = 4096       
 OPUS_SAMPLE_RATE = 48000.0
+STREAM_CHUNK_SIZE = 64 * 1024
+JOURNAL_FILE = ".convert_journal.jsonl" # Fertige Konvertierungen (im OUTPUT_DIR) für Resume & --verify
+VERIFY_TOLERANCE = 1.0 # Sekunden Abweichung zwischen Ausgabe und TAF, die noch als vollständig gilt
+QUARANTINE_DIR = "_quarantaene" # Defekte TAFs (--quarantine) werden hierhin verschoben (im SOURCE_DIR)
+TAF_VERIFY_REPORT = "taf_verify.json" # Ergebnis von --verify-taf (im SOURCE_DIR, sonst --report)
+WRITE_PAGE_INDEX = True # Page-Index als <datei>.taf.pidx neben der TAF ablegen
+WATCH_POLL_INTERVAL = 5 # Sekunden zwischen zwei Ordner-Scans im Dienst-Modus (ohne inotify)
+WATCH_RESCAN_INTERVAL = 30 # Sicherheits-Scan mit inotify (z.B. für Netzlaufwerke ohne Events)
+WATCH_SETTLE = 10 # Sekunden, die Größe & Änderungszeit einer neuen TAF stabil sein müssen
+WATCH_QUEUE_SIZE = 64 # Maximal wartende Dateien im Dienst-Modus
+WATCH_BATCH_SIZE = 16 # Dateien pro Verarbeitungs-Durchgang im Dienst-Modus
+STATS_MAX_FILES = 1000 # Datei-Einträge, die der Laufzeitbericht im Speicher hält (Dienst-Modus läuft unbegrenzt)
+DIST_LEASE_TTL = 120 # Sekunden ohne Lebenszeichen, nach denen die TAF eines Workers neu vergeben wird
+DIST_POLL_INTERVAL = 5 # Sekunden Pause, wenn alle offenen TAFs gerade von anderen Workern belegt sind
+FINGERPRINT_MATCHING = True # Unbekannte Hashes über Laufzeit, Trackzahl & Kapitel-Profil einem DB-Eintrag zuordnen
+FP_MIN_CONFIDENCE = 0.75 # Ab dieser Sicherheit werden die Metadaten des besten Kandidaten übernommen
+FP_RUNTIME_TOLERANCE = 120 # Sekunden Laufzeit-Abweichung, ab der ein Kandidat nicht mehr passt
+FP_WEIGHTS = {'runtime': 0.3, 'tracks': 0.3, 'profile': 0.4} # Anteile am Score (Profil nur, wenn beide Seiten eins haben)
+FP_CANDIDATES = 5 # Kandidaten pro unbekannter TAF in Log und Bericht
+FP_MATCH_REPORT = "taf_match.json" # Ergebnis von --match (im SOURCE_DIR, sonst --report)
 TONIES_DB_URL = "https://raw.githubusercontent.com/toniebox-reverse-engineering/tonies-json/release/toniesV2.json"
 
-# Automatische Tags (Keywords)
+# Automatische Tags (Keywords) - eine taxonomy.json im Quellordner (oder --taxonomy) ersetzt diese Liste
+TAXONOMY_FILE = "taxonomy.json"
 TOPIC_KEYWORDS = {
     "Weihnachten": ["weihnacht", "advent", "christmas", "nikolaus", "rentier", "krippe", "winter"],
     "Märchen": ["märchen", "fee", "hex", "prinz", "könig", "wolf", "rotkäppchen", "grimm", "fabel"],
@@ -46,17 +111,6 @@ TOPIC_KEYWORDS = {
 # TEIL 1: SCRAPING & DATENBANK (ERWEITERT)
 # ==========================================
 
-def download_db():
-    print("🌐 Lade Tonie-Datenbank (V2)...", end=" ")
-    try:
-        r = requests.get(TONIES_DB_URL, timeout=10)
-        if r.status_code == 200: 
-            print("OK ✓")
-            return r.json()
-    except: pass
-    print("Fehler (nutze lokale Datei falls vorhanden)")
-    return []
-
 def normalize_db(json_data):
     """Wandelt die DB in ein Hash-Dictionary um."""
     db = {}
@@ -78,76 +132,511 @@ def normalize_db(json_data):
                     if h: db[h.lower()] = item
     return db
 
-def scrape_full_description(page, url):
+class ToniesDb:
     """
-    Versucht aggressiv, die VOLLE Beschreibung zu holen.
+    Offline-Kopie der Tonie-Datenbank als SQLite-Index (Hash -> Eintrag).
+    refresh() lädt nur bei Änderungen neu (ETag / If-Modified-Since), get() liest
+    einzelne Einträge direkt aus dem Index, ohne die ganze JSON zu laden.
     """
-    if not url or not PLAYWRIGHT_AVAILABLE: return {}
+    def __init__(self, path):
+        # Wird in der Pipeline im Netzwerk-Thread geöffnet und im Event-Loop gelesen (nie gleichzeitig)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, data TEXT);
+            CREATE TABLE IF NOT EXISTS hashes (hash TEXT PRIMARY KEY, entry_id INTEGER);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS fingerprints (hash TEXT, source TEXT, runtime REAL, tracks INTEGER,
+                                                     audio_id INTEGER, profile TEXT, PRIMARY KEY (hash, source));
+            CREATE INDEX IF NOT EXISTS fingerprints_runtime ON fingerprints (runtime);
+            CREATE INDEX IF NOT EXISTS fingerprints_audio_id ON fingerprints (audio_id);""")
+
+    def _state(self, key):
+        row = self.conn.execute("SELECT value FROM state WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO state VALUES (?,?)",
+                              [(k, str(v)) for k, v in values.items() if v is not None])
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    def get(self, file_hash, default=None):
+        if not file_hash: return default
+        row = self.conn.execute("SELECT e.data FROM hashes h JOIN entries e ON e.id = h.entry_id WHERE h.hash=?",
+                                (file_hash.lower(),)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def load(self, json_data):
+        """Ersetzt den Index durch die (normalisierte) JSON-Datenbank."""
+        db = normalize_db(json_data)
+        ids = {}
+        with self.conn:
+            self.conn.execute("DELETE FROM hashes"); self.conn.execute("DELETE FROM entries")
+            for h, entry in db.items():
+                # Ein Eintrag mit mehreren Hashes wird nur einmal gespeichert
+                if id(entry) not in ids:
+                    cur = self.conn.execute("INSERT INTO entries (data) VALUES (?)",
+                                            (json.dumps(entry, ensure_ascii=False),))
+                    ids[id(entry)] = cur.lastrowid
+                self.conn.execute("INSERT OR REPLACE INTO hashes VALUES (?,?)", (h, ids[id(entry)]))
+            self._index_fingerprints(); self._set_state(fingerprints=1)
+        return len(db)
+
+    def _index_fingerprints(self):
+        """Zweitindex für unbekannte Hashes: Laufzeit (s), Trackzahl und Audio-ID je DB-Hash."""
+        self.conn.execute("DELETE FROM fingerprints WHERE source='db'")
+        rows = []
+        for h, data in self.conn.execute("SELECT h.hash, e.data FROM hashes h JOIN entries e ON e.id = h.entry_id"):
+            entry = json.loads(data)
+            try: runtime = float(entry.get('runtime') or 0) * 60 or None
+            except (TypeError, ValueError): runtime = None
+            ident = next((i for i in entry.get('ids') or [] if isinstance(i, dict) and (i.get('hash') or '').lower() == h), {})
+            tracks = ident.get('tracks') or len(entry.get('tracks') or entry.get('track-desc') or []) or None
+            try: audio_id = int(ident.get('audio-id') or 0) or None
+            except (TypeError, ValueError): audio_id = None
+            if runtime or audio_id: rows.append((h, 'db', runtime, tracks, audio_id, None))
+        self.conn.executemany("INSERT OR REPLACE INTO fingerprints VALUES (?,?,?,?,?,?)", rows)
+
+    def learn(self, file_hash, fp):
+        """Exaktes Profil einer erkannten TAF merken (Dauer + Kapitel-Längen), stärker als die DB-Laufzeit."""
+        if not (file_hash and fp and fp.get('profile')): return
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO fingerprints VALUES (?,?,?,?,?,?)",
+                              (file_hash.lower(), 'lokal', fp['duration'], fp['tracks'], fp.get('audio_id'),
+                               json.dumps(fp['profile'])))
+
+    def candidates(self, fp, tolerance=FP_RUNTIME_TOLERANCE):
+        """Fingerprint-Zeilen mit passender Laufzeit oder gleicher Audio-ID: [(Eintrag-ID, Hash, Quelle, Laufzeit, Tracks, Audio-ID, Profil)]."""
+        if not self._state('fingerprints'):
+            # Ältere Cache-Dateien ohne Zweitindex einmalig nachziehen (ohne Netzwerk)
+            with self.conn:
+                self._index_fingerprints(); self._set_state(fingerprints=1)
+        # DB-Laufzeiten sind auf Minuten gerundet -> 30 s zusätzlicher Spielraum
+        lo, hi = fp['duration'] - tolerance - 30, fp['duration'] + tolerance + 30
+        # UNION statt OR, damit beide Bedingungen ihren Index benutzen
+        rows = self.conn.execute("""SELECT h.entry_id, f.hash, f.source, f.runtime, f.tracks, f.audio_id, f.profile
+            FROM (SELECT * FROM fingerprints WHERE runtime BETWEEN ? AND ?
+                  UNION SELECT * FROM fingerprints WHERE audio_id = ?) f JOIN hashes h ON h.hash = f.hash""",
+            (lo, hi, fp.get('audio_id') or -1)).fetchall()
+        return [r[:6] + (json.loads(r[6]) if r[6] else None,) for r in rows]
+
+    def refresh(self, url=TONIES_DB_URL, force=False, timeout=10):
+        """Bedingter Download. Gibt 'neu', 'aktuell', 'offline' oder 'fehler' zurück."""
+        fetched = float(self._state('fetched') or 0)
+        if not force and len(self) and time.time() - fetched < DB_REFRESH_INTERVAL: return 'aktuell'
+        headers = {}
+        if len(self) and self._state('url') == url:
+            if self._state('etag'): headers['If-None-Match'] = self._state('etag')
+            if self._state('last_modified'): headers['If-Modified-Since'] = self._state('last_modified')
+        try:
+            r = requests.get(url, headers=headers, timeout=timeout)
+        except Exception: return 'offline'
+        if r.status_code == 304:
+            with self.conn: self._set_state(fetched=time.time())
+            return 'aktuell'
+        if r.status_code != 200: return 'fehler'
+        try: data = r.json()
+        except ValueError: return 'fehler'
+        self.load(data)
+        with self.conn:
+            self.conn.execute("DELETE FROM state WHERE key IN ('etag', 'last_modified')")
+            self._set_state(url=url, fetched=time.time(), etag=r.headers.get('ETag'),
+                            last_modified=r.headers.get('Last-Modified'))
+        return 'neu'
+
+    def close(self):
+        self.conn.close()
+
+_JSON_LD_RE = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+_AGE_RE = re.compile(r'>\s*ab\s+(\d+)\s+Jahren?\s*<', re.I)
+_LABEL_RE = re.compile(r'>\s*(Hörspiel|Hörbuch|Musik|Wissen|Deutsch|Englisch)\s*<')
+
+def parse_product_html_fast(html):
+    """
+    Schneller Parser für das rohe HTML (ohne DOM): JSON-LD plus Alter/Genre/Sprache
+    aus kurzen Text-Knoten. Liefert dieselben Schlüssel wie parse_product_html.
+    """
+    res = {}
+    for block in _JSON_LD_RE.findall(html):
+        try: data = json.loads(block)
+        except ValueError: continue
+        items = data if isinstance(data, list) else data.get('@graph', [data])
+        for item in items:
+            if not isinstance(item, dict): continue
+            if item.get('description') and 'description' not in res:
+                res['description'] = item['description']
+            audience = item.get('audience')
+            if isinstance(audience, dict) and audience.get('suggestedMinAge') and 'min_age' not in res:
+                try: res['min_age'] = int(float(audience['suggestedMinAge']))
+                except ValueError: pass
+    if 'min_age' not in res:
+        m = _AGE_RE.search(html)
+        if m: res['min_age'] = int(m.group(1))
+    for label in _LABEL_RE.findall(html):
+        if label in ('Deutsch', 'Englisch'): res.setdefault('language', label)
+        else: res.setdefault('genre', label)
+    return res
+
+def make_http_session(pool_size=SCRAPE_HTTP_WORKERS):
+    """requests-Session mit Keep-Alive und Connection-Pool für parallele Abrufe."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter); session.mount("https://", adapter)
+    session.headers['User-Agent'] = "Mozilla/5.0 (TAF Jukebox)"
+    return session
+
+def scrape_fast(session, url):
+    try:
+        r = session.get(url, timeout=10)
+        if r.status_code != 200: return {}
+        return parse_product_html_fast(r.text)
+    except Exception: return {}
+
+def parse_product_html(html):
+    """Beschreibung, Alter, Genre und Sprache aus dem HTML einer tonies.com Produktseite."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    res = {}
     
+    # STRATEGIE A: JSON-LD (Oft die sauberste Quelle ohne "Mehr anzeigen" Probleme)
+    json_ld = soup.find('script', type='application/ld+json')
+    if json_ld:
+        try:
+            data = json.loads(json_ld.string)
+            if isinstance(data, list): data = data[0]
+            if data.get('description'):
+                res['description'] = data.get('description')
+        except: pass
+
+    # STRATEGIE B: HTML Text (Fallback, falls JSON-LD leer)
+    if not res.get('description'):
+        m = soup.find(string=lambda t: t and "Inhalt:" in t)
+        if m:
+            c = m.find_parent()
+            # Gehe Elternbaum hoch, bis wir genug Text haben
+            if len(c.get_text()) < 50: c = c.parent
+            if len(c.get_text()) < 50: c = c.parent 
+            
+            full_text = c.get_text(separator="\n")
+            # Clean up
+            full_text = full_text.replace("Inhalt:", "").split("Titelliste")[0].strip()
+            res['description'] = full_text
+
+    # 3. Metadaten (Alter, Genre)
+    all_texts = [t.get_text(strip=True) for t in soup.find_all(['span', 'div', 'p'])]
+    for txt in all_texts:
+        if 'Jahre' in txt and 'ab' in txt.lower() and len(txt) < 15:
+            res['min_age'] = int(re.findall(r'\d+', txt)[0])
+        elif txt in ['Hörspiel', 'Hörbuch', 'Musik', 'Wissen', 'Deutsch', 'Englisch']:
+            if txt in ['Deutsch', 'Englisch']: res['language'] = txt
+            else: res['genre'] = txt
+            
+    return res
+
+async def scrape_full_description(context, url):
+    """
+    Versucht aggressiv, die VOLLE Beschreibung zu holen (eine Seite im Browser-Kontext).
+    """
+    page = await context.new_page()
     try:
-        page.goto(url, timeout=20000, wait_until="domcontentloaded")
+        await page.goto(url, timeout=20000, wait_until="domcontentloaded")
         
         # 1. Cookies wegklicken
-        try: page.get_by_role("button", name=re.compile("Alle akzeptieren|Akzeptieren")).click(timeout=1000)
+        try: await page.get_by_role("button", name=re.compile("Alle akzeptieren|Akzeptieren")).click(timeout=1000)
         except: pass
 
         # 2. "Mehr anzeigen" klicken (WICHTIG!)
         try:
             expand_btn = page.get_by_text("Mehr anzeigen", exact=False).first
-            if expand_btn.is_visible():
-                expand_btn.click(timeout=1000)
-                time.sleep(1.0) # Warten, bis Textanimation fertig ist
+            if await expand_btn.is_visible():
+                await expand_btn.click(timeout=1000)
+                # Warten, bis der Button weg ist (Text aufgeklappt) statt fester Pause
+                await expand_btn.wait_for(state="hidden", timeout=2000)
         except: pass
         
-        soup = BeautifulSoup(page.content(), 'html.parser')
-        res = {}
-        
-        # STRATEGIE A: JSON-LD (Oft die sauberste Quelle ohne "Mehr anzeigen" Probleme)
-        json_ld = soup.find('script', type='application/ld+json')
-        if json_ld:
-            try:
-                data = json.loads(json_ld.string)
-                if isinstance(data, list): data = data[0]
-                if data.get('description'):
-                    res['description'] = data.get('description')
-            except: pass
-
-        # STRATEGIE B: HTML Text (Fallback, falls JSON-LD leer)
-        if not res.get('description'):
-            m = soup.find(string=lambda t: t and "Inhalt:" in t)
-            if m:
-                c = m.find_parent()
-                # Gehe Elternbaum hoch, bis wir genug Text haben
-                if len(c.get_text()) < 50: c = c.parent
-                if len(c.get_text()) < 50: c = c.parent 
-                
-                full_text = c.get_text(separator="\n")
-                # Clean up
-                full_text = full_text.replace("Inhalt:", "").split("Titelliste")[0].strip()
-                res['description'] = full_text
-
-        # 3. Metadaten (Alter, Genre)
-        all_texts = [t.get_text(strip=True) for t in soup.find_all(['span', 'div', 'p'])]
-        for txt in all_texts:
-            if 'Jahre' in txt and 'ab' in txt.lower() and len(txt) < 15:
-                res['min_age'] = int(re.findall(r'\d+', txt)[0])
-            elif txt in ['Hörspiel', 'Hörbuch', 'Musik', 'Wissen', 'Deutsch', 'Englisch']:
-                if txt in ['Deutsch', 'Englisch']: res['language'] = txt
-                else: res['genre'] = txt
-                
-        return res
+        return parse_product_html(await page.content())
     except Exception as e:
         print(f"   (Scrape Fehler: {e})")
         return {}
+    finally:
+        await page.close()
+
+class BrowserPool:
+    """
+    Ein Chromium pro Lauf, erst beim ersten Bedarf gestartet, mit `size` festen Kontexten.
+    scrape() leiht sich einen Kontext aus; schlägt der Start fehl, wird es nicht erneut versucht.
+    """
+    def __init__(self, size=SCRAPE_CONCURRENCY):
+        self.size = max(1, size)
+        self._playwright = self._browser = self._contexts = None
+        self._error = None
+        self._lock = asyncio.Lock()
+
+    async def _start(self):
+        async with self._lock:
+            if self._error: raise RuntimeError(self._error)
+            if self._contexts is not None: return
+            try:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                contexts = asyncio.Queue()
+                for _ in range(self.size): contexts.put_nowait(await self._browser.new_context())
+                self._contexts = contexts
+            except Exception as e:
+                self._error = f"Browser Start fehlgeschlagen: {e}"
+                await self.close()
+                raise RuntimeError(self._error)
+
+    async def scrape(self, url):
+        await self._start()
+        context = await self._contexts.get()
+        try: return await scrape_full_description(context, url)
+        finally: self._contexts.put_nowait(context)
+
+    async def close(self):
+        try:
+            if self._browser: await self._browser.close()
+            if self._playwright: await self._playwright.stop()
+        except Exception: pass
+        self._browser = self._playwright = None
+
+class ScrapeCache:
+    """Gescrapte Produktseiten (URL -> Ergebnis) mit Ablaufzeit."""
+    def __init__(self, path, ttl=SCRAPE_TTL):
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS scrape (url TEXT PRIMARY KEY, data TEXT, fetched REAL)")
+
+    def get(self, url):
+        row = self.conn.execute("SELECT data FROM scrape WHERE url=? AND fetched>?",
+                                (url, time.time() - self.ttl)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, url, data):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO scrape VALUES (?,?,?)",
+                              (url, json.dumps(data, ensure_ascii=False), time.time()))
+
+    def close(self):
+        self.conn.close()
+
+def needs_scrape(meta):
+    # Wir scrapen, wenn wir keine gute Beschreibung haben
+    return bool(meta.get('web')) and len(meta.get('description') or '') < 20
+
+def load_tonies_db(url=TONIES_DB_URL, offline=False, path=None):
+    """Tonie-DB-Index öffnen und bei Bedarf aktualisieren; Fallback: lokale tonies.json."""
+    db = ToniesDb(path or os.path.join(SOURCE_DIR, DB_CACHE_FILE))
+    if not offline:
+        print("🌐 Lade Tonie-Datenbank (V2)...", end=" ")
+        status = db.refresh(url)
+        if status == 'neu': print(f"OK ✓ ({len(db)} Hashes)")
+        elif status == 'aktuell': print(f"unverändert ✓ ({len(db)} Hashes)")
+        else: print("Fehler (nutze lokale Kopie falls vorhanden)")
+    if not len(db):
+        print("   Suche lokale 'tonies.json'...", end=" ")
+        if os.path.exists(JSON_FILE):
+            with open(JSON_FILE, 'r', encoding='utf-8') as f: db.load(json.load(f))
+            print("Gefunden ✓")
+        else:
+            print("Nicht gefunden ✗")
+    return db
+
+def taf_fingerprint(taf):
+    """
+    Billige Merkmale einer TAF für den Abgleich ohne Hash: Dauer (s), Kapitelzahl, relative
+    Kapitel-Längen (aus Page-Index & Kapiteltabelle) und Audio-ID aus dem Header.
+    Ohne Page-Index (--trust-header-hash) wird nur die letzte Page gelesen; dann ohne Profil.
+    """
+    duration = taf.duration if taf.analyzed else tail_duration(taf.path)
+    if not duration: return None
+    fp = {'duration': duration, 'tracks': len(taf.chapters), 'profile': None,
+          'audio_id': (taf.header.stream_id if taf.header else 0) or None}
+    if taf.analyzed and len(taf.index):
+        table = chapter_table(taf.chapters, taf.index, [])
+        total = (table[-1][1] - table[0][0]) or 1
+        fp['profile'] = [round((end - start) / total, 4) for start, end, _name in table]
+    return fp
+
+def fingerprint_score(fp, source, runtime, tracks, audio_id, profile):
+    """
+    Vergleicht eine Fingerprint-Zeile mit der TAF. Gibt (Score, Beleg) zurück: Score 0..1 ist
+    geteilt durch die Gewichte, die für die Zeile gelten (DB-Zeilen haben kein Profil und
+    erreichen mit passender Laufzeit & Trackzahl trotzdem 1; fehlende Trackzahl zählt als 0).
+    Beleg = ungeteilte Summe; ein passendes Kapitel-Profil wiegt damit mehr als nur die Laufzeit.
+    Gleiche Audio-ID zählt als sicherer Treffer.
+    """
+    if audio_id and audio_id == fp['audio_id']: return 1.0, 1.0
+    score = 0.0
+    weights = FP_WEIGHTS['runtime'] + FP_WEIGHTS['tracks']
+    if runtime:
+        # DB-Laufzeiten sind auf Minuten gerundet, gelernte Profile sekundengenau
+        off = max(0.0, abs(runtime - fp['duration']) - (2 if source == 'lokal' else 30))
+        score += FP_WEIGHTS['runtime'] * max(0.0, 1 - off / FP_RUNTIME_TOLERANCE)
+    if tracks and fp['tracks']:
+        diff = abs(tracks - fp['tracks'])
+        score += FP_WEIGHTS['tracks'] * (1.0 if diff == 0 else 0.5 if diff == 1 else 0.0)
+    if profile and fp['profile']:
+        weights += FP_WEIGHTS['profile']
+        if len(profile) == len(fp['profile']):
+            # L1-Abstand der Längenverteilungen: 0 = identisch
+            score += FP_WEIGHTS['profile'] * max(0.0, 1 - sum(abs(a - b) for a, b in zip(profile, fp['profile'])))
+    return score / weights, score
+
+def match_fingerprint(taf, db, limit=FP_CANDIDATES):
+    """
+    Rangliste möglicher DB-Einträge für eine TAF mit unbekanntem Hash (eigene Uploads, Re-Encodes)
+    aus dem Fingerprint-Index, ohne Netzwerk. Pro Eintrag zählt der beste Hash; die Sicherheit
+    sinkt, wenn mehrere Einträge ähnlich gut passen. Gibt [{hash, title, score, confidence}] zurück.
+    """
+    fp = taf_fingerprint(taf)
+    if not fp or not hasattr(db, 'candidates'): return []
+    best = {}
+    for entry_id, h, *row in db.candidates(fp):
+        if h == taf.hash: continue
+        score, evidence = fingerprint_score(fp, *row)
+        if evidence > best.get(entry_id, (0.0,))[0]: best[entry_id] = (evidence, score, h)
+    # Geschärfte Anteile am Beleg (Potenz 8): ein klarer Favorit behält seinen Score, ein Gleichstand halbiert ihn
+    norm = sum(evidence ** 8 for evidence, _s, _h in best.values())
+    return [{'hash': h, 'title': resolve_metadata(h, db)['title'], 'score': round(score, 3),
+             'confidence': round(score * evidence ** 8 / norm, 3)}
+            for evidence, score, h in sorted(best.values(), reverse=True)[:limit]]
+
+def learn_fingerprint(db, taf):
+    """Profil einer per Hash erkannten TAF im Fingerprint-Index ablegen (hilft bei späteren Re-Encodes)."""
+    if hasattr(db, 'learn') and taf.analyzed and taf.hash: db.learn(taf.hash, taf_fingerprint(taf))
+
+def resolve_metadata(file_hash, db, scraped_pages=None):
+    """DB-Eintrag + gescrapte Details ({url: Ergebnis}) zu einem flachen Metadaten-Dict zusammenführen."""
+    meta = db.get(file_hash, {})
+    
+    # Basis Info
+    series = meta.get('series', '')
+    episode = meta.get('episode', '')
+    title = f"{series} - {episode}" if series and episode else (series or episode or "Unbekannt")
+    if title == "Unbekannt" and meta.get('title'): title = meta.get('title')
+    
+    # Gescrapte Details (siehe fetch_page in run_pipeline)
+    scraped = {}
+    if scraped_pages and needs_scrape(meta):
+        scraped = scraped_pages.get(meta['web']) or {}
+    
+    # Daten konsolidieren
+    final_age = scraped.get('min_age') or meta.get('age') or 0
+    try: final_age = int(final_age)
+    except: final_age = 0
+    return {
+        'title': title, 'series': series,
+        'description': scraped.get('description') or meta.get('description', ''),
+        'age': final_age, 'genre': scraped.get('genre') or "Hörspiel",
+        'runtime': meta.get('runtime', 0),
+        'tracks': meta.get('tracks') or meta.get('track-desc') or [],
+        'cover_url': meta.get('image') or meta.get('pic'),
+    }
+
+def load_taxonomy(path):
+    """
+    Taxonomie-Datei (JSON) laden: {"Kategorie": ["keyword", ...]} oder mehrsprachig
+    {"Kategorie": {"de": [...], "en": [...]}}. Keywords werden klein geschrieben.
+    """
+    with open(path, encoding='utf-8') as f: data = json.load(f)
+    if not isinstance(data, dict): raise ValueError("Taxonomie muss ein JSON-Objekt {Kategorie: [Keywords]} sein")
+    taxonomy = {}
+    for category, words in data.items():
+        if isinstance(words, str): words = [words]
+        elif isinstance(words, dict): words = [w for group in words.values() for w in ([group] if isinstance(group, str) else group)]
+        taxonomy[str(category)] = [str(w).lower() for w in words if str(w).strip()]
+    return taxonomy
+
+def _trie_regex(words):
+    """Keywords als Trie-Regex ("hex(?:e)?|..."): an jeder Position gewinnt das längste Keyword."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w: node = node.setdefault(ch, {})
+        node[''] = True
+    def build(node):
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts: return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if '' in node else body
+    return build(trie)
+
+class Tagger:
+    """
+    Schlagwort-Tagger: die Taxonomie wird EINMAL zu einem Trie-Regex kompiliert, die Suche
+    über den ganzen Text läuft dann in einem Durchgang in C (statt einem Teilstring-Scan
+    pro Keyword). Treffer wie bisher als Teilstring irgendwo im Text; zu jeder Kategorie
+    wird gemeldet, welches Keyword gezündet hat.
+    """
+    def __init__(self, taxonomy):
+        self.categories = list(taxonomy)
+        owners = {}  # Keyword -> Kategorien
+        for category, words in taxonomy.items():
+            for w in words:
+                if w and category not in owners.setdefault(w, []): owners[w].append(category)
+        self.keywords = len(owners)
+        # Der Regex liefert pro Position nur das längste Keyword; kürzere am selben Start sind dessen Präfixe
+        self._fires = {w: [(w[:n], c) for n in range(1, len(w) + 1) if w[:n] in owners for c in owners[w[:n]]]
+                       for w in owners}
+        self._regex = re.compile("(?=(" + _trie_regex(owners) + "))") if owners else None
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_taxonomy(path))
+
+    def match(self, text):
+        """{Kategorie: Keyword} für alle Kategorien, deren Keywords in `text` vorkommen."""
+        hits = {}
+        if self._regex is None: return hits
+        fires = self._fires
+        for m in self._regex.finditer(text.lower()):
+            for keyword, category in fires[m.group(1)]:
+                if category not in hits: hits[category] = keyword
+        return hits
+
+    def tag(self, title, desc, genre=""):
+        """Gibt (Tags, {Kategorie: Keyword}) zurück; das Genre wird immer als Tag übernommen."""
+        hits = self.match(str(title) + " " + str(desc) + " " + str(genre))
+        tags = [c for c in self.categories if c in hits]
+        if genre and genre not in tags: tags.append(genre)
+        return tags, hits
+
+_tagger = None
+
+def get_tagger():
+    global _tagger
+    if _tagger is None: _tagger = Tagger(TOPIC_KEYWORDS)
+    return _tagger
+
+def set_taxonomy(path):
+    """Taxonomie-Datei für alle folgenden detect_tags()-Aufrufe laden."""
+    global _tagger
+    _tagger = Tagger.from_file(path)
+    return _tagger
 
 def detect_tags(title, desc, genre=""):
-    tags = []
-    full_text = (str(title) + " " + str(desc) + " " + str(genre)).lower()
-    for category, keywords in TOPIC_KEYWORDS.items():
-        if any(k in full_text for k in keywords):
-            tags.append(category)
-    if genre and genre not in tags: tags.append(genre)
-    return list(set(tags))
+    return get_tagger().tag(title, desc, genre)[0]
+
+def retag_catalog(catalog, tagger, stats=None):
+    """
+    Alle automatischen Einträge der jukebox.json in einem Durchgang neu taggen (Name,
+    Beschreibung, Genre). Manuelle Einträge behalten ihre Tags. Gibt die Anzahl geänderter Einträge zurück.
+    """
+    changed = 0
+    for entry in catalog.entries:
+        if not str(entry.get('tagId', '')).startswith("auto_"): continue
+        meta = entry.get('meta') if isinstance(entry.get('meta'), dict) else {}
+        tags, hits = tagger.tag(entry.get('name', ''), meta.get('description', ''), meta.get('genre', ''))
+        fired = ", ".join(f"{c} ({k})" for c, k in hits.items())
+        if sorted(tags) != sorted(entry.get('tags') or []):
+            changed += 1
+            print(f"   🏷️  {entry.get('name')}: {', '.join(tags) or '-'}" + (f"  <- {fired}" if fired else ""))
+        entry['tags'] = tags
+        if stats: stats.file(taf=entry.get('name'), tagId=entry.get('tagId'), tags=tags, keywords=hits)
+    return changed
 
 # ==========================================
 # TEIL 2: AUDIO VERARBEITUNG (ROBUST)
@@ -163,46 +652,98 @@ def read_varint(data, offset):
         shift += 7
     return value, curr
 
-def get_chapters_robust(filepath):
+def write_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f; value >>= 7
+        if value: out.append(byte | 0x80)
+        else: out.append(byte); return bytes(out)
+
+# Protobuf "TonieHeader": 1=dataHash (bytes), 2=dataLength, 3=timestamp (Stream-ID),
+# 4=chapterPages (packed uint32), 5=Padding. Davor 4 Byte Länge (Big Endian).
+TafHeader = namedtuple("TafHeader", "sha1 audio_length stream_id chapters")
+
+def parse_taf_header(data):
+    """Dekodiert den Protobuf-Header einer TAF. Gibt None zurück, wenn er kaputt ist."""
+    try:
+        pb_len = struct.unpack_from(">L", data, 0)[0]
+        end = 4 + pb_len
+        if end > len(data): return None
+        pos = 4
+        sha1 = None; audio_length = 0; stream_id = 0; chapters = []
+        while pos < end:
+            key, pos = read_varint(data, pos)
+            field, wire = key >> 3, key & 7
+            if wire == 0:
+                val, pos = read_varint(data, pos)
+                if field == 2: audio_length = val
+                elif field == 3: stream_id = val
+                elif field == 4: chapters.append(val)  # unpacked repeated
+            elif wire == 2:
+                n, pos = read_varint(data, pos)
+                if pos + n > end: return None
+                if field == 1: sha1 = bytes(data[pos:pos+n]).hex()
+                elif field == 4:
+                    cur = pos
+                    while cur < pos + n:
+                        val, cur = read_varint(data, cur)
+                        chapters.append(val)
+                pos += n
+            elif wire == 1: pos += 8
+            elif wire == 5: pos += 4
+            else: return None
+        if pos != end: return None
+        return TafHeader(sha1, audio_length, stream_id, chapters)
+    except (ValueError, struct.error): return None
+
+def build_taf_header(sha1, audio_length, stream_id, chapters):
+    """Gegenstück zu parse_taf_header: erzeugt einen HEADER_SIZE Byte großen Header."""
+    body = b'\x0a' + write_varint(20) + bytes.fromhex(sha1)
+    body += b'\x10' + write_varint(audio_length) + b'\x18' + write_varint(stream_id)
+    packed = b"".join(write_varint(c) for c in chapters)
+    body += b'\x22' + write_varint(len(packed)) + packed
+    # Padding-Feld füllt exakt auf HEADER_SIZE auf (Tag + Längen-Varint + Nullbytes)
+    remaining = HEADER_SIZE - 4 - len(body)
+    for n in (1, 2, 3):
+        fill = remaining - 1 - n
+        if fill >= 0 and len(write_varint(fill)) == n:
+            body += b'\x2a' + write_varint(fill) + b'\0' * fill
+            return struct.pack(">L", len(body)) + body
+    raise ValueError("Header zu groß")
+
+def _guess_chapters(data):
+    """Notfall-Suche nach einer Kapitel-Liste, wenn der Header nicht dekodierbar ist."""
     best_chapters = []
+    for i in range(len(data) - 2):
+        if data[i] == 0x22:
+            try:
+                length = data[i+1]; start = i + 2; end = start + length
+                if end > len(data): continue
+                temp = []; curr = start
+                while curr < end:
+                    val, curr = read_varint(data, curr)
+                    temp.append(val)
+                if len(temp) > len(best_chapters):
+                    if all(temp[j] <= temp[j+1] for j in range(len(temp)-1)):
+                        best_chapters = temp
+            except: continue
+    return best_chapters
+
+def parse_chapters(data, header=None):
+    """Kapitel-Liste (Page-Nummern) aus dem TAF-Header."""
+    header = header or parse_taf_header(data)
+    chapters = header.chapters if header else _guess_chapters(data)
+    return sorted(list(set([0] + chapters)))
+
+def get_chapters_robust(filepath):
     try:
         with open(filepath, "rb") as f:
-            data = f.read(HEADER_SIZE)
-            for i in range(len(data) - 2):
-                if data[i] == 0x22:
-                    try:
-                        length = data[i+1]; start = i + 2; end = start + length
-                        if end > len(data): continue
-                        temp = []; curr = start
-                        while curr < end:
-                            val, curr = read_varint(data, curr)
-                            temp.append(val)
-                        if len(temp) > len(best_chapters):
-                            if all(temp[j] <= temp[j+1] for j in range(len(temp)-1)):
-                                best_chapters = temp
-                    except: continue
-    except: pass
-    return sorted(list(set([0] + best_chapters)))
+            return parse_chapters(f.read(HEADER_SIZE))
+    except: return [0]
 
 def scan_ogg_timestamps(filepath):
-    page_map = {}
-    try:
-        with open(filepath, "rb") as f:
-            f.seek(HEADER_SIZE)
-            file_size = os.fstat(f.fileno()).st_size
-            while f.tell() < file_size:
-                pos = f.tell()
-                sig = f.read(4)
-                if sig != b'OggS':
-                    if not sig: break
-                    f.seek(pos + 1); continue
-                head = f.read(23)
-                if len(head) < 23: break
-                data = struct.unpack("<BBQLLLB", head)
-                page_map[data[4]] = data[2] 
-                f.seek(sum(f.read(data[6])), 1)
-    except: pass
-    return page_map
+    try: return TafFile(filepath).analyze().page_map
+    except: return {}
 
 def granule_to_cue(granule):
     seconds = granule / OPUS_SAMPLE_RATE
@@ -221,6 +762,333 @@ def get_hash(path):
         return s.hexdigest().lower()
     except: return None
 
+_OGG_PAGE_HEAD = struct.Struct("<BBqLLLB")  # ab Offset 4 hinter 'OggS'
+_PIDX_HEAD = struct.Struct("<8s20sQqI3s")   # Magic, SHA-1, Größe, mtime_ns, Anzahl Pages, Item-Größen
+_PIDX_MAGIC = b"TAFPIDX2"
+_PIDX_ITEMS = bytes((4, 8, 8))               # feste Breiten: Page-Nr. u32, Granule i64, Offset u64
+
+class OggPageIndex:
+    """
+    Kompakter Page-Index: Page-Nummer, Granule und Byte-Offset als parallele Arrays.
+    Wird per mmap + bytes.find gebaut und kann als Sidecar-Datei gespeichert werden.
+    """
+    def __init__(self):
+        self.pages = array('I')
+        self.granules = array('q')
+        self.offsets = array('Q')
+
+    def __len__(self):
+        return len(self.pages)
+
+    def add(self, seq, granule, offset):
+        self.pages.append(seq); self.granules.append(granule); self.offsets.append(offset)
+
+    @classmethod
+    def scan(cls, buf, start=HEADER_SIZE):
+        """Indexiert alle Pages in `buf` (bytes/mmap) ab `start`."""
+        idx = cls()
+        find = buf.find; unpack = _OGG_PAGE_HEAD.unpack_from; end = len(buf)
+        add_page = idx.pages.append; add_gran = idx.granules.append; add_off = idx.offsets.append
+        pos = find(b'OggS', start)
+        while 0 <= pos and pos + 27 <= end:
+            _ver, _type, granule, _serial, seq, _crc, n_segs = unpack(buf, pos + 4)
+            body_start = pos + 27 + n_segs
+            if body_start > end: break
+            add_page(seq); add_gran(granule); add_off(pos)
+            # Nächste Page liegt normalerweise direkt dahinter; find() resynct sonst in C
+            pos = find(b'OggS', body_start + sum(buf[pos+27:body_start]))
+        idx.sort()
+        return idx
+
+    def sort(self):
+        """Stellt sicher, dass die Page-Nummern aufsteigend sind (Voraussetzung für bisect)."""
+        pages = self.pages
+        if all(pages[i] <= pages[i+1] for i in range(len(pages) - 1)): return
+        order = sorted(range(len(pages)), key=pages.__getitem__)
+        self.pages = array('I', (pages[i] for i in order))
+        self.granules = array('q', (self.granules[i] for i in order))
+        self.offsets = array('Q', (self.offsets[i] for i in order))
+
+    def granule_before(self, page):
+        """Granule der letzten Page vor `page` (binäre Suche), None wenn keine existiert."""
+        i = bisect.bisect_left(self.pages, page) - 1
+        while i >= 0 and self.granules[i] < 0: i -= 1
+        return self.granules[i] if i >= 0 else None
+
+    def offset_of(self, page):
+        i = bisect.bisect_left(self.pages, page)
+        if i < len(self.pages) and self.pages[i] == page: return self.offsets[i]
+        return None
+
+    def last_granule(self):
+        return max((g for g in self.granules if g >= 0), default=0)
+
+    def to_bytes(self):
+        parts = [self.pages, self.granules, self.offsets]
+        if sys.byteorder != 'little':
+            parts = [array(a.typecode, a) for a in parts]
+            for a in parts: a.byteswap()
+        return b"".join(a.tobytes() for a in parts)
+
+    @classmethod
+    def from_bytes(cls, data, count):
+        idx = cls(); pos = 0
+        if bytes(getattr(idx, n).itemsize for n in ('pages', 'granules', 'offsets')) != _PIDX_ITEMS:
+            raise ValueError("Array-Typen ohne feste Breite auf dieser Plattform")
+        if len(data) != count * sum(_PIDX_ITEMS):
+            raise ValueError("Index-Länge passt nicht (altes Format?)")
+        for name in ('pages', 'granules', 'offsets'):
+            a = getattr(idx, name)
+            n = count * a.itemsize
+            a.frombytes(data[pos:pos+n]); pos += n
+            if sys.byteorder != 'little': a.byteswap()
+        if any(len(getattr(idx, n)) != count for n in ('pages', 'granules', 'offsets')):
+            raise ValueError("Index unvollständig")
+        return idx
+
+def _sidecar_path(taf_path):
+    return taf_path + ".pidx"
+
+def save_page_index(taf_path, sha1, index):
+    """Schreibt Hash + Page-Index neben die TAF (atomar, Fehler werden ignoriert)."""
+    try:
+        st = os.stat(taf_path)
+        target = _sidecar_path(taf_path); tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_PIDX_HEAD.pack(_PIDX_MAGIC, bytes.fromhex(sha1), st.st_size, st.st_mtime_ns, len(index), _PIDX_ITEMS))
+            f.write(index.to_bytes())
+        os.replace(tmp, target)
+    except OSError: pass
+
+def load_page_index(taf_path):
+    """Lädt (sha1, OggPageIndex) aus dem Sidecar, wenn die TAF seitdem unverändert ist."""
+    try:
+        st = os.stat(taf_path)
+        with open(_sidecar_path(taf_path), "rb") as f: data = f.read()
+        magic, sha1, size, mtime_ns, count, items = _PIDX_HEAD.unpack_from(data, 0)
+        if magic != _PIDX_MAGIC or items != _PIDX_ITEMS: return None
+        if size != st.st_size or mtime_ns != st.st_mtime_ns: return None
+        return sha1.hex(), OggPageIndex.from_bytes(data[_PIDX_HEAD.size:], count)
+    except (OSError, ValueError, struct.error): return None
+
+class TafFile:
+    """
+    Analysiert eine TAF in EINEM Durchlauf: SHA-1 der Audiodaten, OGG-Page-Index
+    (Page -> Granule / Byte-Offset), Kapitel und Gesamtdauer.
+
+    analyze() arbeitet per mmap (bzw. lädt den Sidecar-Index); alternativ werden die
+    Blöcke per feed() von einem anderen Leser (z.B. dem FFmpeg-Stream) durchgereicht ("tee").
+    """
+    def __init__(self, path):
+        self.path = path
+        self.header = None      # TafHeader oder None
+        self.hash = None
+        self.analyzed = False   # True, sobald der Audio-Teil komplett gelesen wurde
+        self.chapters = [0]
+        self.index = OggPageIndex()
+        self.duration = 0.0     # Sekunden
+        self.audio_size = 0
+        self._sha = None
+
+    @property
+    def page_map(self):
+        """Page-Nummer -> Granule (nur Pages mit gültiger Granule)."""
+        return {p: g for p, g in zip(self.index.pages, self.index.granules) if g >= 0}
+
+    def read_header(self):
+        """Nur den Header lesen; der Hash kommt dann aus dem Header (--trust-header-hash)."""
+        with open(self.path, "rb") as f: self._set_header(f.read(HEADER_SIZE))
+        if self.header and self.header.sha1: self.hash = self.header.sha1.lower()
+        return self
+
+    def _set_header(self, data):
+        self.header = parse_taf_header(data)
+        self.chapters = parse_chapters(data, self.header)
+
+    def begin(self, header):
+        self._set_header(header)
+        self.index = OggPageIndex(); self.audio_size = 0
+        self._sha = hashlib.sha1()
+        self._buf = bytearray()
+        self._base = HEADER_SIZE  # Datei-Offset von _buf[0]
+        self._skip = 0            # Noch zu überspringende Page-Body-Bytes
+
+    def feed(self, chunk):
+        self._sha.update(chunk)
+        self.audio_size += len(chunk)
+        buf = self._buf
+        buf += chunk
+        i = 0; end = len(buf)
+        while True:
+            if self._skip:
+                take = min(self._skip, end - i)
+                i += take; self._skip -= take
+                if self._skip: break
+            if end - i < 27: break
+            if buf[i:i+4] != b'OggS':
+                # Sync verloren -> direkt zur nächsten Signatur springen
+                j = buf.find(b'OggS', i + 1)
+                if j < 0: i = max(i, end - 3); break
+                i = j; continue
+            n_segs = buf[i+26]
+            if end - i < 27 + n_segs: break
+            _ver, _type, granule, _serial, seq, _crc, _n = _OGG_PAGE_HEAD.unpack_from(buf, i + 4)
+            self.index.add(seq, granule, self._base + i)
+            self._skip = sum(buf[i+27:i+27+n_segs])
+            i += 27 + n_segs
+        del buf[:i]
+        self._base += i
+
+    def finish(self):
+        self.index.sort()
+        self._complete(self._sha.hexdigest().lower())
+        self._sha = None; self._buf = None
+        if WRITE_PAGE_INDEX: save_page_index(self.path, self.hash, self.index)
+        return self
+
+    def _complete(self, sha1):
+        self.hash = sha1
+        self.analyzed = True
+        self.duration = self.index.last_granule() / OPUS_SAMPLE_RATE
+
+    def analyze(self):
+        with open(self.path, "rb") as f:
+            self._set_header(f.read(HEADER_SIZE))
+            size = os.fstat(f.fileno()).st_size
+            self.audio_size = max(0, size - HEADER_SIZE)
+            cached = load_page_index(self.path)
+            if cached:
+                self.index = cached[1]
+                self._complete(cached[0])
+                return self
+            sha = hashlib.sha1()
+            if size > HEADER_SIZE:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    view = memoryview(mm)
+                    try: sha.update(view[HEADER_SIZE:])
+                    finally: view.release()
+                    self.index = OggPageIndex.scan(mm)
+        self._complete(sha.hexdigest().lower())
+        if WRITE_PAGE_INDEX: save_page_index(self.path, self.hash, self.index)
+        return self
+
+    def header_hash_ok(self):
+        """Vergleicht den berechneten Audio-Hash mit dem im Header eingebetteten."""
+        if not (self.analyzed and self.header and self.header.sha1): return None
+        return self.header.sha1.lower() == self.hash
+
+def analyze_taf(path, trust_header_hash=False):
+    try:
+        taf = TafFile(path)
+        if trust_header_hash:
+            taf.read_header()
+            if taf.hash: return taf
+        return taf.analyze()
+    except Exception: return TafFile(path)
+
+def tail_duration(path, size=64 * 1024):
+    """Dauer aus der Granule der letzten OGG-Page; liest nur das Dateiende."""
+    try:
+        with open(path, "rb") as f:
+            end = f.seek(0, 2)
+            f.seek(max(HEADER_SIZE, end - size)); buf = f.read()
+    except OSError: return 0.0
+    pos = buf.rfind(b'OggS')
+    while pos >= 0:
+        if pos + 27 <= len(buf):
+            granule = _OGG_PAGE_HEAD.unpack_from(buf, pos + 4)[2]
+            if granule >= 0: return granule / OPUS_SAMPLE_RATE
+        pos = buf.rfind(b'OggS', 0, pos)
+    return 0.0
+
+def _analyze_taf_trusted(path):
+    return analyze_taf(path, trust_header_hash=True)
+
+_BITREV = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+def ogg_crc(data, crc_offset=None):
+    """
+    OGG-CRC32 (Polynom 0x04C11DB7, nicht gespiegelt, Start 0, kein XOR am Ende).
+    Rechnet mit der tabellengesteuerten CRC aus zlib (C) auf bitgespiegelten Bytes statt
+    einer Python-Schleife. Mit `crc_offset` werden die 4 Byte des CRC-Felds als 0 gezählt.
+    """
+    data = data.translate(_BITREV)
+    if crc_offset is None: crc = zlib.crc32(data, 0xFFFFFFFF)
+    else:
+        crc = zlib.crc32(data[:crc_offset], 0xFFFFFFFF)
+        crc = zlib.crc32(data[crc_offset + 4:], zlib.crc32(b"\0\0\0\0", crc))
+    return int.from_bytes((crc ^ 0xFFFFFFFF).to_bytes(4, 'little').translate(_BITREV), 'big')
+
+def verify_taf(path, max_examples=5):
+    """
+    Vollständige Integritätsprüfung einer TAF (liest die Datei einmal per mmap):
+    Header, Header-Hash und -Länge gegen das Audio, lückenlose OGG-Pages (keine Fremd-Bytes,
+    nicht abgeschnitten), fortlaufende Page-Nummern, eine Stream-Serial, steigende Granules,
+    CRC jeder Page und Kapitel-Pages. Gibt einen Bericht als Dict zurück (errors leer = in Ordnung).
+    """
+    errors = []; warnings = []
+    counts = {}
+    def fail(kind, text):
+        counts[kind] = counts.get(kind, 0) + 1
+        if counts[kind] <= max_examples: errors.append(f"{kind}: {text}")
+    report = {'file': os.path.basename(path), 'path': os.path.abspath(path), 'size': 0, 'pages': 0,
+              'duration': 0.0, 'sha1': None, 'header_sha1': None}
+    try:
+        with open(path, "rb") as f:
+            size = report['size'] = os.fstat(f.fileno()).st_size
+            if size <= HEADER_SIZE:
+                fail("header", f"Datei zu klein ({size} Byte)")
+                return {**report, 'ok': False, 'errors': errors, 'warnings': warnings, 'counts': counts}
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header = parse_taf_header(mm[:HEADER_SIZE])
+                view = memoryview(mm)
+                try: report['sha1'] = hashlib.sha1(view[HEADER_SIZE:]).hexdigest()
+                finally: view.release()
+                if header is None: fail("header", "Protobuf-Header nicht lesbar")
+                else:
+                    report['header_sha1'] = header.sha1
+                    if not header.sha1: fail("header", "kein SHA-1 im Header")
+                    elif header.sha1.lower() != report['sha1']: fail("hash", "Header-Hash passt nicht zum Audio")
+                    if header.audio_length and header.audio_length != size - HEADER_SIZE:
+                        fail("length", f"Header: {header.audio_length} Byte Audio, Datei: {size - HEADER_SIZE} Byte")
+
+                unpack = _OGG_PAGE_HEAD.unpack_from
+                pos = HEADER_SIZE; seq_prev = None; gran_prev = -1; serial0 = None; last_type = 0; pages = 0
+                while pos < size:
+                    if size - pos < 27 or mm[pos:pos+4] != b'OggS':
+                        nxt = mm.find(b'OggS', pos + 1)
+                        if nxt < 0:
+                            fail("truncated" if mm[pos:pos+4] == b'OggS' else "garbage",
+                                 f"{size - pos} Byte ohne gültige Page am Ende (Offset {pos})")
+                            break
+                        fail("garbage", f"{nxt - pos} Byte ohne Page bei Offset {pos}")
+                        pos = nxt; continue
+                    ver, htype, granule, serial, seq, crc, n_segs = unpack(mm, pos + 4)
+                    body = pos + 27 + n_segs
+                    end = body + sum(mm[pos+27:body]) if body <= size else body
+                    if end > size:
+                        fail("truncated", f"Page {seq} bei Offset {pos} ist abgeschnitten")
+                        break
+                    pages += 1
+                    if ver != 0: fail("page", f"Page {seq}: unbekannte Version {ver}")
+                    if serial0 is None: serial0 = serial
+                    elif serial != serial0: fail("serial", f"Page {seq}: Stream-Serial {serial:#x} statt {serial0:#x}")
+                    if seq_prev is None:
+                        if seq != 0: fail("sequence", f"erste Page hat Nummer {seq}")
+                    elif seq != seq_prev + 1: fail("sequence", f"Page {seq} folgt auf {seq_prev} (Offset {pos})")
+                    if granule != -1:
+                        if granule < gran_prev: fail("granule", f"Page {seq}: Granule {granule} < {gran_prev}")
+                        gran_prev = max(gran_prev, granule)
+                    if ogg_crc(mm[pos:end], 22) != crc: fail("crc", f"Page {seq} bei Offset {pos}")
+                    seq_prev = seq; last_type = htype; pos = end
+                report['pages'] = pages
+                report['duration'] = round(max(gran_prev, 0) / OPUS_SAMPLE_RATE, 3)
+                if pages and not last_type & 4: warnings.append("letzte Page ohne End-of-Stream-Flag")
+                for ch in (header.chapters if header else []):
+                    if ch >= pages: fail("chapter", f"Kapitel-Page {ch} existiert nicht ({pages} Pages)")
+    except OSError as e: fail("io", str(e))
+    return {**report, 'ok': not counts, 'errors': errors, 'warnings': warnings, 'counts': counts}
+
 # ==========================================
 # TEIL 3: HELFER
 # ==========================================
@@ -228,22 +1096,179 @@ def get_hash(path):
 def clean_filename(name):
     return "".join([c if c.isalnum() or c in " .-_()" else "_" for c in name]).strip()
 
-def dl_cover(url, target):
+def dl_cover(url, target, session=None):
+    """Lädt ein Cover über eine eigene Temp-Datei und benennt sie erst danach um (parallel sicher)."""
+    tmp = None
     try:
-        r = requests.get(url, timeout=10)
+        r = (session or requests).get(url, timeout=10)
         if r.status_code == 200:
-            with open(target, 'wb') as f: f.write(r.content)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target) or ".", suffix=".part")
+            with os.fdopen(fd, 'wb') as f: f.write(r.content)
+            os.chmod(tmp, 0o644) # mkstemp legt 0600 an
+            os.replace(tmp, target)
             return True
     except: pass
+    if tmp and os.path.exists(tmp): os.remove(tmp)
     return False
 
-def convert_audio_with_progress(audio_data, mp3_path, meta, cover_path=None):
-    cmd = ['ffmpeg', '-y', '-f', 'ogg', '-i', 'pipe:0']
-    
-    if cover_path:
-        cmd += ['-i', cover_path, '-map', '0:0', '-map', '1:0', '-c:v', 'copy', 
-                '-id3v2_version', '3', '-metadata:s:v', 'title="Cover"', '-metadata:s:v', 'comment="Front"']
-    
+class CoverStore:
+    """
+    Cover-Ablage nach URL-Hash: jede URL wird genau einmal geladen (parallel, über
+    eine gemeinsame Session) und dann per Hardlink bzw. Kopie ins Ziel gelegt.
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, url):
+        return os.path.join(self.root, hashlib.sha1(url.encode('utf-8')).hexdigest() + ".jpg")
+
+    def fetch(self, url, session=None):
+        """Lädt eine URL, falls sie noch fehlt. True, wenn das Cover danach vorliegt."""
+        path = self.path_for(url)
+        return os.path.exists(path) or dl_cover(url, path, session)
+
+    def place(self, url, target):
+        """Legt das Cover zu `url` unter `target` ab (Hardlink, sonst Kopie)."""
+        return link_file(self.path_for(url), target)
+
+def link_file(src, target):
+    """`src` unter `target` ablegen (Hardlink, sonst Kopie); vorhandene Ziele bleiben."""
+    if not os.path.exists(src): return False
+    if os.path.exists(target): return True
+    try: os.link(src, target)
+    except OSError:
+        try: shutil.copyfile(src, target)
+        except OSError: return False
+    return True
+
+def output_spec(fmt):
+    """Ausgabe-Spezifikation (wie OUTPUT_FORMATS + 'format') zu einem Formatnamen; Profile sind schon eine."""
+    return fmt if isinstance(fmt, dict) else {'format': fmt, **OUTPUT_FORMATS[fmt]}
+
+def make_profile(text):
+    """
+    Profil aus OUTPUT_PROFILES ("klein") oder direkt angegeben: "name=format[:bitrate][:mono|stereo][:samplerate]",
+    z.B. "alt=mp3:48k:mono:22050". Gibt eine Ausgabe-Spezifikation mit Ordner ('dir') und Journal-Kennung ('id') zurück.
+    """
+    name, _, inline = text.partition("=")
+    name = name.strip()
+    if inline:
+        fmt, *opts = inline.split(":")
+        cfg = {'format': fmt}
+        for opt in opts:
+            if opt in ('mono', 'stereo'): cfg['channels'] = 1 if opt == 'mono' else 2
+            elif opt.lower().endswith('k'): cfg['bitrate'] = opt
+            elif opt.isdigit(): cfg['sample_rate'] = int(opt)
+            elif opt: raise ValueError(f"Unbekannte Profil-Option '{opt}'")
+    elif name in OUTPUT_PROFILES: cfg = OUTPUT_PROFILES[name]
+    else: raise ValueError(f"Unbekanntes Profil '{name}' (bekannt: {', '.join(OUTPUT_PROFILES)})")
+    if not name or cfg.get('format') not in OUTPUT_FORMATS:
+        raise ValueError(f"Profil '{text}': Format muss eines von {', '.join(sorted(OUTPUT_FORMATS))} sein")
+    spec = output_spec(cfg['format'])
+    audio = list(spec['audio'])
+    if any(cfg.get(k) for k in ('bitrate', 'channels', 'sample_rate')):
+        # Umverpacken übernimmt den Stream unverändert -> für Opus-Profile neu kodieren
+        if audio[1] == 'copy': audio = ['-c:a', 'libopus'] + audio[2:]
+        if cfg.get('bitrate'):
+            if '-q:a' in audio: i = audio.index('-q:a'); del audio[i:i+2]
+            audio += ['-b:a', str(cfg['bitrate'])]
+        if cfg.get('channels'): audio += ['-ac', str(cfg['channels'])]
+        if cfg.get('sample_rate'): audio += ['-ar', str(cfg['sample_rate'])]
+    return {**spec, 'audio': audio, 'name': name, 'dir': cfg.get('dir') or f"{OUTPUT_DIR}_{name}",
+            'id': " ".join([cfg['format']] + audio)}
+
+def part_path(path):
+    """Temporärer Name im selben Ordner (Endung bleibt, damit FFmpeg das Format erkennt)."""
+    folder, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f".{stem}.part{ext}")
+
+def _segments(pattern):
+    """Dateien eines Segment-Musters (%02d) in Reihenfolge, solange sie existieren."""
+    n = 1
+    while os.path.exists(pattern % n):
+        yield n; n += 1
+
+def commit_part(tmp_path, out_path, split=False):
+    """Temp-Ausgabe(n) atomar unter dem endgültigen Namen ablegen."""
+    if not split: os.replace(tmp_path, out_path); return
+    for n in list(_segments(tmp_path)): os.replace(tmp_path % n, out_path % n)
+
+def discard_part(tmp_path, split=False):
+    """Reste eines fehlgeschlagenen / abgebrochenen Encodes entfernen."""
+    paths = [tmp_path % n for n in _segments(tmp_path)] if split else [tmp_path]
+    for p in paths:
+        try: os.remove(p)
+        except OSError: pass
+
+def probe_duration(path):
+    """
+    Tatsächlich enthaltene Audiodauer: FFmpeg kopiert alle Audio-Pakete ins Leere (-c copy, ohne
+    Dekodieren) und meldet die letzte Position. Die "Duration:" von `ffmpeg -i` stammt bei VBR-MP3
+    aus dem Xing/LAME-Header und stimmt bei abgeschnittenen Dateien nicht. None = nicht lesbar.
+    """
+    try:
+        r = subprocess.run(['ffmpeg', '-hide_banner', '-nostats', '-v', 'error', '-progress', 'pipe:1', '-i', path,
+                            '-map', '0:a', '-c', 'copy', '-f', 'null', '-'], capture_output=True, timeout=300)
+    except (OSError, subprocess.TimeoutExpired): return None
+    if r.returncode != 0: return None
+    state = {}
+    _read_ffmpeg_progress(r.stdout.splitlines(), state)
+    return state.get('time')
+
+def outputs_complete(paths, duration):
+    """Ergeben die Ausgabedateien zusammen die Dauer laut Page-Index? (findet abgebrochene Encodes)"""
+    total = 0.0
+    for p in paths:
+        d = probe_duration(p) if os.path.exists(p) else None
+        if d is None: return False
+        total += d
+    return abs(total - duration) <= max(VERIFY_TOLERANCE, duration * 0.01)
+
+def _fmt_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}" if seconds >= 3600 else f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+def format_progress(name, frac, elapsed, pos=None, duration=None, speed=None):
+    """Fortschrittszeile: Balken, Prozent, Position/Dauer, ETA und Tempo (x Echtzeit)."""
+    frac = min(max(frac, 0.0), 1.0)
+    bar = "#" * int(frac * 20)
+    line = f"{name}: [{bar:<20}] {int(frac * 100):3d}%"
+    if pos is not None and duration: line += f" {_fmt_time(pos)}/{_fmt_time(duration)}"
+    if 0 < frac < 1: line += f" ETA {_fmt_time(elapsed * (1 - frac) / frac)}"
+    if speed: line += f" {speed:.1f}x"
+    return line
+
+def _read_ffmpeg_progress(stream, state):
+    """Liest FFmpegs `-progress` Ausgabe (key=value Zeilen) und merkt sich Position und Tempo."""
+    for raw in stream:
+        key, _, value = raw.decode('ascii', 'replace').strip().partition('=')
+        # out_time_ms ist trotz des Namens ebenfalls in Mikrosekunden
+        if key in ('out_time_us', 'out_time_ms') and value.isdigit(): state['time'] = int(value) / 1e6
+        elif key == 'speed' and value.endswith('x'):
+            try: state['speed'] = float(value[:-1])
+            except ValueError: pass
+
+PROGRESS_INTERVAL = 0.25  # Sekunden zwischen zwei Fortschrittsanzeigen
+
+def _output_args(spec, path, meta, split=False, chapters=None, cover_input=None, meta_input=None):
+    """FFmpeg-Optionen für EINE Ausgabedatei (Maps, Codec, Tags, Dateiname)."""
+    out = ['-map', '0:a']
+    if split:
+        # Schnitt an den Kapitel-Startzeiten; Cover und Kapitelmarken entfallen pro Segment
+        times = ",".join(f"{start / OPUS_SAMPLE_RATE:.3f}" for start, _end, _name in chapters[1:])
+        out += ['-f', 'segment', '-segment_format', spec['muxer'], '-segment_times', times,
+                '-segment_start_number', '1', '-reset_timestamps', '1']
+    elif cover_input is not None and spec['cover']:
+        out += ['-map', f'{cover_input}:v', '-c:v', 'copy']
+        if spec['format'] == 'mp3':
+            out += ['-id3v2_version', '3', '-metadata:s:v', 'title="Cover"', '-metadata:s:v', 'comment="Front"']
+        else:
+            out += ['-disposition:v', 'attached_pic']
+    if meta_input is not None and spec['format'] != 'mp3' and not split:
+        out += ['-map_chapters', str(meta_input)]
+
     title = meta.get('title', 'Unknown')
     artist = meta.get('series', 'Tonie')
     
@@ -251,184 +1276,1612 @@ def convert_audio_with_progress(audio_data, mp3_path, meta, cover_path=None):
     comment = meta.get('description', '') 
     if meta.get('age'): comment = f"Alter: {meta['age']}+\n\n{comment}"
     
-    cmd += ['-c:a', 'libmp3lame', '-q:a', '2', 
+    # Container explizit: an der Endung .m4a würde FFmpeg den ipod-Muxer wählen (kein Opus)
+    muxer = [] if split else ['-f', spec['muxer']]
+    return out + spec['audio'] + [
             '-metadata', f'title={title}', 
             '-metadata', f'artist={artist}',
             '-metadata', f'genre={meta.get("genre", "Hörspiel")}',
             '-metadata', f'comment={comment}', # Volle Beschreibung
-            mp3_path]
+            ] + muxer + [path]
 
-    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    
-    # Progress Simulation (da wir stdin nutzen)
-    total_size = len(audio_data)
-    chunk_size = 64 * 1024
+def convert_audio_with_progress(taf_path, out_path, meta, cover_path=None, progress=None, taf=None,
+                               fmt=OUTPUT_FORMAT, chapters=None, split=False, duration=None, extra=()):
+    """
+    Streamt die Audiodaten der TAF blockweise in FFmpeg (konstanter Speicherbedarf).
+    Ist `taf` ein TafFile, wird es aus demselben Stream mitanalysiert.
+    Der Fortschritt kommt aus FFmpegs `-progress` (Position im Audio, bezogen auf
+    `duration` in Sekunden); ohne Dauer wird nach gelesenen Bytes geschätzt.
+    Bei opus/ogg/m4a werden die Opus-Pakete nur umverpackt (-c:a copy); `chapters`
+    (siehe chapter_table) landen dann direkt im Container.
+    Mit `split` wird pro Kapitel eine Datei geschrieben (Segment-Muxer, ein Decode);
+    `out_path` ist dann ein Muster mit %02d.
+    `extra` = [(Ausgabe-Spezifikation, Pfad)] für weitere Profile: FFmpeg dekodiert die TAF
+    nur einmal und schreibt alle Ausgaben im selben Durchlauf (gleiches Cover, gleiche Kapitel).
+    """
+    outputs = [(output_spec(fmt), out_path)] + list(extra)
+    # FFmpeg schreibt in Temp-Dateien; erst wenn alle fertig sind, werden sie umbenannt
+    tmp_paths = [part_path(path) for _spec, path in outputs]
+    cmd = ['ffmpeg', '-y', '-nostats', '-progress', 'pipe:1', '-f', 'ogg', '-i', 'pipe:0']
+    cover_input = meta_input = meta_file = None
+    if cover_path and not split and any(spec['cover'] for spec, _path in outputs):
+        cover_input = cmd.count('-i')
+        cmd += ['-i', cover_path]
+    if chapters and not split and any(spec['format'] != 'mp3' for spec, _path in outputs):
+        fd, meta_file = tempfile.mkstemp(suffix=".ffmeta")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f: f.write(ffmetadata_chapters(chapters))
+        meta_input = cmd.count('-i')
+        cmd += ['-f', 'ffmetadata', '-i', meta_file]
+    for (spec, _path), tmp_path in zip(outputs, tmp_paths):
+        cmd += _output_args(spec, tmp_path, meta, split, chapters, cover_input, meta_input)
+
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    state = {}
+    reader = threading.Thread(target=_read_ffmpeg_progress, args=(process.stdout, state), daemon=True)
+    reader.start()
+
+    total_size = max(1, os.path.getsize(taf_path) - HEADER_SIZE)
+    buf = bytearray(STREAM_CHUNK_SIZE); view = memoryview(buf)
     written = 0
-    display_name = os.path.basename(mp3_path)[:20]
+    display_name = os.path.basename(out_path).replace("%02d", "xx")[:20]
+    started = time.perf_counter(); next_update = started
+
+    def show(final=False, mark=" ✓"):
+        elapsed = time.perf_counter() - started
+        if duration and 'time' in state:
+            line = format_progress(display_name, 1.0 if final else state['time'] / duration, elapsed,
+                                   duration if final else state['time'], duration, state.get('speed'))
+        else:
+            line = format_progress(display_name, 1.0 if final else written / total_size, elapsed)
+        if progress: progress(line + (mark if final else ""))
+        else:
+            sys.stdout.write(f"\r  -> {line}{mark if final else ''}\x1b[K" + ("\n" if final else ""))
+            sys.stdout.flush()
     
     try:
-        for i in range(0, total_size, chunk_size):
-            chunk = audio_data[i:i+chunk_size]
-            process.stdin.write(chunk)
-            written += len(chunk)
-            perc = int(written/total_size*100)
-            sys.stdout.write(f"\r  -> Konvertiere: {perc}%")
-            sys.stdout.flush()
+        with open(taf_path, "rb") as src:
+            header = src.read(HEADER_SIZE)
+            if taf: taf.begin(header)
+            while True:
+                # readinto + memoryview: ein Puffer für die ganze Datei, keine Kopien
+                n = src.readinto(buf)
+                if not n: break
+                process.stdin.write(view[:n])
+                if taf: taf.feed(view[:n])
+                written += n
+                # Anzeige gedrosselt statt bei jedem Block
+                if time.perf_counter() >= next_update:
+                    show(); next_update = time.perf_counter() + PROGRESS_INTERVAL
         process.stdin.close()
-        process.wait()
-        sys.stdout.write("\r  -> Konvertiere: 100% ✓   \n")
-        return process.returncode == 0
-    except: return False
+        while process.poll() is None:
+            try: process.wait(PROGRESS_INTERVAL)
+            except subprocess.TimeoutExpired: show()
+        reader.join()
+        if taf: taf.finish()
+        if process.returncode != 0:
+            show(final=True, mark=" ✗"); return False
+        for (_spec, path), tmp_path in zip(outputs, tmp_paths): commit_part(tmp_path, path, split)
+        show(final=True)
+        return True
+    except:
+        if process.poll() is None: process.kill(); process.wait()
+        return False
+    finally:
+        if meta_file: os.remove(meta_file)
+        for tmp_path in tmp_paths: discard_part(tmp_path, split)
+
+def chapter_table(chapters, index, track_list):
+    """Kapitel als [(Start-Granule, End-Granule, Titel)] aus Kapitel-Pages und Page-Index."""
+    starts = []
+    for ch in chapters:
+        granule = index.granule_before(ch) if ch > 0 else None
+        starts.append(granule or 0)
+    ends = starts[1:] + [max(index.last_granule(), starts[-1] if starts else 0)]
+    return [(start, end, track_list[i] if i < len(track_list) else f"Kapitel {i+1}")
+            for i, (start, end) in enumerate(zip(starts, ends))]
+
+def playback_info(taf, track_list):
+    """
+    Dauer und Sprungtabelle für die Jukebox: exakte Gesamtdauer (Sekunden), Laufzeit in
+    Minuten (wie meta.runtime) und pro Kapitel Titel, Start und Länge aus dem Page-Index.
+    Keine Byte-Offsets: auch bei -c:a copy paginiert der Muxer neu (eigene Serial, neue OpusTags).
+    """
+    if not taf.analyzed or not taf.duration: return None
+    table = chapter_table(taf.chapters, taf.index, track_list)
+    chapters = []
+    for start, end, name in table:
+        chapters.append({"title": name, "start": round(start / OPUS_SAMPLE_RATE, 3),
+                         "duration": round((end - start) / OPUS_SAMPLE_RATE, 3)})
+    return {"duration": round(taf.duration, 3), "runtime": max(1, round(taf.duration / 60)), "chapters": chapters}
+
+def ffmetadata_chapters(table):
+    """FFmpeg-Metadaten-Datei (;FFMETADATA1) mit den Kapiteln in Opus-Samples (48 kHz)."""
+    def esc(v): return re.sub(r'([=;#\\\n])', r'\\\1', str(v))
+    lines = [";FFMETADATA1"]
+    for start, end, name in table:
+        lines += ["[CHAPTER]", "TIMEBASE=1/48000", f"START={start}", f"END={end}", f"title={esc(name)}"]
+    return "\n".join(lines) + "\n"
+
+def write_cue(cue_path, audio_path, title, table, cue_type="MP3"):
+    tmp = part_path(cue_path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(f'REM CREATED BY TAF CONVERTER\nTITLE "{title}"\nFILE "{os.path.basename(audio_path)}" {cue_type}\n')
+        for idx, (start, _end, t_name) in enumerate(table):
+            f.write(f'  TRACK {idx+1:02d} AUDIO\n    TITLE "{t_name}"\n    INDEX 01 {granule_to_cue(start)}\n')
+    os.replace(tmp, cue_path)
+
+class Catalog:
+    """
+    jukebox.json als inkrementeller Katalog: bestehende Einträge bleiben erhalten
+    (auch manuelle wie 'manual_*'), automatische werden per tagId ersetzt.
+    Jede Änderung wird sofort atomar gespeichert (Temp-Datei + os.replace).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._order = {}  # tagId -> Rang neuer Einträge (Dateireihenfolge, siehe reserve)
+        try:
+            with open(path, encoding='utf-8') as f: data = json.load(f)
+            if isinstance(data, list): self.entries = [e for e in data if isinstance(e, dict)]
+        except FileNotFoundError: pass
+        except Exception as e:
+            # Kaputte Datei nicht überschreiben, sondern zur Seite legen
+            print(f"⚠️  {os.path.basename(path)} nicht lesbar ({e}), wird neu angelegt.")
+            try: os.replace(path, path + ".bak")
+            except: pass
+
+    def get(self, tag_id):
+        for entry in self.entries:
+            if entry.get('tagId') == tag_id: return entry
+        return None
+
+    def reserve(self, tag_id):
+        """
+        Platz für einen neuen Eintrag in Dateireihenfolge vormerken. Parallele Encodes werden in
+        beliebiger Reihenfolge fertig; upsert() sortiert neue Einträge nach diesem Rang ein.
+        """
+        if tag_id not in self._order and self.get(tag_id) is None: self._order[tag_id] = len(self._order)
+
+    def upsert(self, entry):
+        for i, old in enumerate(self.entries):
+            if old.get('tagId') == entry['tagId']:
+                self.entries[i] = entry; return
+        rank = self._order.get(entry['tagId'])
+        if rank is not None:
+            # Vor den ersten neuen Eintrag mit höherem Rang; bestehende Einträge behalten ihre Position
+            for i, old in enumerate(self.entries):
+                if self._order.get(old.get('tagId'), -1) > rank:
+                    self.entries.insert(i, entry); return
+        self.entries.append(entry)
+
+    def drop_auto(self):
+        """Alle automatisch erzeugten Einträge entfernen, manuelle bleiben."""
+        self.entries = [e for e in self.entries if not str(e.get('tagId', '')).startswith("auto_")]
+
+    def save(self):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=4, ensure_ascii=False)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self.path)
+        except:
+            if os.path.exists(tmp): os.remove(tmp)
+            raise
+
+class RunJournal:
+    """
+    Append-only Protokoll fertiger Konvertierungen (eine JSON-Zeile pro Titel): Quell-Hash,
+    Format und Größe jeder Ausgabedatei. Ein abgebrochener Lauf setzt genau bei den Titeln
+    ohne gültigen Eintrag wieder an; eine halb geschriebene letzte Zeile wird ignoriert.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.dir = os.path.dirname(path) or "."
+        self.records = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try: rec = json.loads(line)
+                    except ValueError: continue
+                    if rec.get('drop'): self.records.pop(rec.get('hash'), None)
+                    elif rec.get('hash'): self.records[rec['hash']] = rec
+        except FileNotFoundError: pass
+
+    def is_done(self, sha1, fmt, names):
+        """Gibt es einen Eintrag für diesen Quell-Hash, dessen Dateien unverändert vorliegen?"""
+        rec = self.records.get(sha1)
+        if not rec or rec.get('format') != fmt or sorted(rec['files']) != sorted(names): return False
+        for name, size in rec['files'].items():
+            try:
+                if os.path.getsize(os.path.join(self.dir, name)) != size: return False
+            except OSError: return False
+        return True
+
+    def record(self, sha1, taf_name, fmt, paths, duration):
+        # Fehlt eine Ausgabe (z.B. weniger Segmente als Kapitel), bleibt der Titel offen
+        if not all(os.path.exists(p) for p in paths): return
+        rec = {'hash': sha1, 'taf': taf_name, 'format': fmt, 'duration': round(duration, 3),
+               'files': {os.path.basename(p): os.path.getsize(p) for p in paths}, 'ts': int(time.time())}
+        self._append(rec)
+        self.records[sha1] = rec
+
+    def drop(self, sha1):
+        if self.records.pop(sha1, None): self._append({'hash': sha1, 'drop': True})
+
+    def adopt(self, rec):
+        """Fertigen Eintrag aus einem anderen Journal übernehmen (Zusammenführen im verteilten Modus)."""
+        if self.records.get(rec['hash']) != rec:
+            self._append(rec)
+            self.records[rec['hash']] = rec
+
+    def _append(self, rec):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush(); os.fsync(f.fileno())
+
+class OutputTree:
+    """Ordner eines zusätzlichen Ausgabe-Profils mit eigener jukebox.json und eigenem Journal."""
+    def __init__(self, spec):
+        self.spec = spec
+        os.makedirs(spec['dir'], exist_ok=True)
+        self.catalog = Catalog(os.path.join(spec['dir'], "jukebox.json"))
+        self.journal = RunJournal(os.path.join(spec['dir'], JOURNAL_FILE))
+
+    def reload(self):
+        self.catalog = Catalog(self.catalog.path)
+
+class RunStats:
+    """
+    Laufzeiten pro Phase (Analyse, Datenbank, Scraping, Cover, Encode) und pro Datei.
+    Mit `events_path` wird jedes Ereignis zusätzlich sofort als JSON-Zeile angehängt
+    (für Dashboards, die einen laufenden Batch beobachten).
+    """
+    def __init__(self, events_path=None):
+        self.started = time.time()
+        self.stages = []; self.files = deque(maxlen=STATS_MAX_FILES); self.open = {}
+        self.events = open(events_path, 'a', encoding='utf-8') if events_path else None
+        self.emit('run_start', argv=sys.argv[1:])
+
+    def emit(self, event, **fields):
+        if not self.events: return
+        self.events.write(json.dumps({'ts': round(time.time(), 3), 'event': event, **fields}, ensure_ascii=False) + "\n")
+        self.events.flush()
+
+    def begin(self, stage):
+        self.open[stage] = time.perf_counter()
+        self.emit('stage_start', stage=stage)
+
+    def _stage(self, stage, seconds, items, size):
+        """Phase aufsummieren: jede Phase hat genau einen Eintrag (auch über viele Durchgänge im Dienst-Modus)."""
+        rec = next((r for r in self.stages if r['stage'] == stage), None)
+        if rec is None:
+            rec = {'stage': stage, 'seconds': 0.0, 'items': 0, 'bytes': 0}
+            self.stages.append(rec)
+        rec['seconds'] = round(rec['seconds'] + seconds, 3); rec['items'] += items; rec['bytes'] += size
+
+    def end(self, stage, items=0, size=0):
+        seconds = round(time.perf_counter() - self.open.pop(stage), 3)
+        self._stage(stage, seconds, items, size)
+        self.emit('stage_end', stage=stage, seconds=seconds, items=items, bytes=size)
+
+    def add(self, stage, seconds, items=1, size=0):
+        """Dauer einer Einzelaufgabe zur Phase addieren (in der Pipeline laufen Phasen überlappend)."""
+        self._stage(stage, seconds, items, size)
+        self.emit('task_done', stage=stage, seconds=round(seconds, 3))
+
+    def file(self, **rec):
+        # Nur die letzten STATS_MAX_FILES bleiben im Speicher; das Ereignis-Log (--events) hat alle
+        self.files.append(rec)
+        self.emit('file_done', **rec)
+
+    def summary(self):
+        return " | ".join(f"{r['stage']} {r['seconds']:.1f}s" for r in self.stages)
+
+    def write_report(self, path):
+        """Bericht als CSV (Endung .csv) oder JSON schreiben."""
+        if path.lower().endswith(".csv"):
+            cols = ['type', 'name', 'seconds', 'items', 'bytes', 'audio_seconds', 'speed', 'ok']
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                w = csv.DictWriter(f, fieldnames=cols, extrasaction='ignore')
+                w.writeheader()
+                for r in self.stages: w.writerow({'type': 'stage', 'name': r['stage'], **r})
+                for r in self.files: w.writerow({'type': 'file', 'name': r['taf'], **r})
+        else:
+            report = {'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                      'total_seconds': round(time.time() - self.started, 3),
+                      'stages': self.stages, 'files': list(self.files)}
+            with open(path, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        self.emit('run_end', seconds=round(time.time() - self.started, 3))
+        if self.events: self.events.close()
 
 # ==========================================
-# TEIL 4: MAIN
+# TEIL 4: ANALYSE-CACHE
 # ==========================================
 
-def main():
+class AnalysisCache:
+    """
+    SQLite-Cache pro TAF: Hash, Header, Kapitel, Page-Index, Laufzeit und die
+    aufgelösten Metadaten. Ein Eintrag gilt nur, solange Größe, mtime und Inode
+    der Datei unverändert sind. Wird nur vom Hauptprozess benutzt.
+    """
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER,
+            sha1 TEXT, header TEXT, chapters TEXT, page_count INTEGER, page_index BLOB,
+            duration REAL, audio_size INTEGER, meta TEXT)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_identity ON files (inode, size, mtime_ns)")
+        self.conn.commit()
+
+    @staticmethod
+    def _identity(path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def _row(self, path):
+        key = os.path.abspath(path)
+        size, mtime_ns, inode = self._identity(path)
+        cols = "sha1, header, chapters, page_count, page_index, duration, audio_size, meta"
+        row = self.conn.execute(f"SELECT {cols} FROM files WHERE path=? AND size=? AND mtime_ns=? AND inode=?",
+                                (key, size, mtime_ns, inode)).fetchone()
+        if row: return row
+        # Umbenannte Datei: gleiche Identität unter altem Pfad -> übernehmen
+        row = self.conn.execute(f"SELECT {cols}, path FROM files WHERE inode=? AND size=? AND mtime_ns=?",
+                                (inode, size, mtime_ns)).fetchone()
+        if row and not os.path.exists(row[-1]):
+            self.conn.execute("UPDATE files SET path=? WHERE path=?", (key, row[-1]))
+            self.conn.commit()
+            return row[:-1]
+        return None
+
+    def get(self, path):
+        """Liefert (TafFile, Metadaten-Dict oder None) oder (None, None) bei Cache-Miss."""
+        try: row = self._row(path)
+        except OSError: return None, None
+        if not row: return None, None
+        sha1, header, chapters, page_count, page_index, duration, audio_size, meta = row
+        # Index im alten Format (plattformabhängige Breite) -> wie Cache-Miss neu analysieren
+        try: index = OggPageIndex.from_bytes(page_index, page_count)
+        except ValueError: return None, None
+        taf = TafFile(path)
+        taf.hash = sha1
+        taf.header = TafHeader(*json.loads(header)) if header else None
+        taf.chapters = json.loads(chapters)
+        taf.index = index
+        taf.duration = duration; taf.audio_size = audio_size
+        taf.analyzed = True
+        return taf, (json.loads(meta) if meta else None)
+
+    def put_analysis(self, taf):
+        if not (taf.analyzed and taf.hash): return
+        size, mtime_ns, inode = self._identity(taf.path)
+        # Metadaten bleiben erhalten, solange sich der Audio-Hash nicht ändert
+        self.conn.execute("""INSERT INTO files VALUES (?,?,?,?,?,?,?,?,?,?,?,NULL)
+            ON CONFLICT(path) DO UPDATE SET size=excluded.size, mtime_ns=excluded.mtime_ns,
+            inode=excluded.inode, header=excluded.header, chapters=excluded.chapters,
+            page_count=excluded.page_count, page_index=excluded.page_index,
+            duration=excluded.duration, audio_size=excluded.audio_size,
+            meta=CASE WHEN files.sha1=excluded.sha1 THEN files.meta END, sha1=excluded.sha1""", (
+            os.path.abspath(taf.path), size, mtime_ns, inode, taf.hash,
+            json.dumps(list(taf.header)) if taf.header else None, json.dumps(taf.chapters),
+            len(taf.index), taf.index.to_bytes(), taf.duration, taf.audio_size))
+        self.conn.commit()
+
+    def put_meta(self, path, meta):
+        self.conn.execute("UPDATE files SET meta=? WHERE path=?",
+                          (json.dumps(meta, ensure_ascii=False), os.path.abspath(path)))
+        self.conn.commit()
+
+    def prune(self, paths):
+        """Entfernt Einträge für Dateien, die nicht mehr existieren."""
+        keep = {os.path.abspath(p) for p in paths}
+        stale = [r[0] for r in self.conn.execute("SELECT path FROM files") if r[0] not in keep and not os.path.exists(r[0])]
+        self.conn.executemany("DELETE FROM files WHERE path=?", [(p,) for p in stale])
+        self.conn.commit()
+
+    def clear(self):
+        self.conn.execute("DELETE FROM files")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+# ==========================================
+# TEIL 5: PARALLELE VERARBEITUNG
+# ==========================================
+
+# Wird im Worker-Prozess durch _init_worker gesetzt
+_WORKER_SLOT = None
+_PROGRESS_QUEUE = None
+
+def _init_worker(slot_queue, progress_queue):
+    """Jeder Worker bekommt eine feste Zeile im ProgressBoard."""
+    global _WORKER_SLOT, _PROGRESS_QUEUE
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)  # nicht den Watch-Handler des Hauptprozesses erben
+    _WORKER_SLOT = slot_queue.get()
+    _PROGRESS_QUEUE = progress_queue
+
+def _worker_progress(text):
+    if _PROGRESS_QUEUE is not None:
+        _PROGRESS_QUEUE.put(('line', _WORKER_SLOT, text))
+
+class ProgressBoard:
+    """
+    Zeichnet eine Fortschrittszeile pro Worker (ANSI) am Ende der Ausgabe.
+    Log-Meldungen werden oberhalb der Zeilen eingeschoben.
+    """
+    def __init__(self, slots, queue, live=True):
+        self.lines = [""] * slots
+        self.queue = queue
+        self.live = live  # False (z.B. Dienst/Logdatei): nur Log-Meldungen, keine ANSI-Zeilen
+        self.thread = None
+
+    def start(self):
+        if self.live:
+            if os.name == 'nt': os.system("")  # ANSI in der Windows-Konsole aktivieren
+            sys.stdout.write("\n" * len(self.lines))
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def log(self, text):
+        self.queue.put(('log', None, text))
+
+    def stop(self):
+        self.queue.put(None)
+        if self.thread: self.thread.join()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None: break
+            kind, slot, text = item
+            if not self.live:
+                if kind == 'log': print(text, flush=True)
+                continue
+            out = f"\x1b[{len(self.lines)}F"
+            if kind == 'log': out += f"\x1b[2K{text}\n"
+            else: self.lines[slot] = f"  [W{slot+1}] {text}"
+            out += "".join(f"\x1b[2K{line}\n" for line in self.lines)
+            sys.stdout.write(out)
+            sys.stdout.flush()
+
+def convert_job(job, progress=None):
+    """
+    Encode/Remux + CUE für eine TAF. Läuft im Worker-Prozess (oder direkt bei --jobs 1).
+    Kapitel und Page-Index stammen aus der TafFile-Analyse, die TAF wird nur
+    noch für den Encode gelesen. Zusätzliche Profile (job['extra']) entstehen im selben
+    FFmpeg-Aufruf. Gibt (Log-Zeilen, TafFile, Statistik) zurück; stats['status'] enthält
+    pro Ausgabe (Haupt-Ausgabe, dann Profile) 'ok', 'failed', 'verified' oder 'done'.
+    """
+    logs = []; started = time.perf_counter(); ok = None
+    taf = job['taf']
+    split = job['split']
+    # Beim Aufteilen müssen die Schnittzeiten vor dem Encode feststehen
+    if split and not taf.analyzed: taf.analyze()
+    outputs = [job] + job.get('extra', [])
+    status = ['done' if out.get('done') else None for out in outputs]
+    for k, out in enumerate(outputs):
+        if status[k] or not all(os.path.exists(f) for f in out['out_files']): continue
+        # Ausgaben ohne Journal-Eintrag (älterer Lauf) nur übernehmen, wenn der Katalog-Eintrag dieser TAF
+        # genau diese Dateien nennt (sonst könnten es die gleichnamigen eines anderen Titels sein)
+        # und die tatsächlich enthaltene Dauer zum Page-Index passt
+        if not out.get('adopt'): continue
+        if not taf.analyzed: taf.analyze()
+        if outputs_complete(out['out_files'], taf.duration):
+            logs.append(f"   -> {os.path.basename(out['out_files'][0])} geprüft ✓")
+            status[k] = 'verified'
+        else:
+            logs.append(f"   ⚠️  {os.path.basename(out['out_files'][0])} unvollständig -> wird neu erzeugt")
+    todo = [k for k, st in enumerate(status) if not st]
+    if todo:
+        # Fehlt die Analyse noch (--trust-header-hash), läuft sie im selben Lesedurchgang wie der Encode mit
+        tee = taf if not taf.analyzed else None
+        table = chapter_table(taf.chapters, taf.index, job['track_list']) if taf.analyzed and len(taf.chapters) > 1 else None
+        first = outputs[todo[0]]
+        try:
+            ok = convert_audio_with_progress(taf.path, first['out_path'], job['convert_meta'], job['cover_path'], progress, tee,
+                                             first['format'], table, split, taf.duration if taf.analyzed else None,
+                                             [(output_spec(outputs[k]['format']), outputs[k]['out_path']) for k in todo[1:]])
+            if not ok: logs.append(f"   ✗ FFmpeg Fehler: {os.path.basename(first['out_path'])}")
+        except Exception as e: logs.append(f"   ✗ Fehler: {e}"); ok = False
+        for k in todo: status[k] = 'ok' if ok else 'failed'
+        if tee and tee.header_hash_ok() is False:
+            logs.append(f"   ⚠️  Header-Hash passt nicht zum Audio: {os.path.basename(taf.path)}")
+    else:
+        if status[0] == 'done': logs.append(f"   -> {os.path.basename(job['out_files'][0])} existiert bereits.")
+        if not taf.analyzed and len(taf.chapters) > 1: taf.analyze()
+
+    # CUE Sheet (für MP3; bei den anderen Formaten zusätzlich zu den eingebetteten Kapiteln)
+    if len(taf.chapters) > 1 and not split:
+        table = chapter_table(taf.chapters, taf.index, job['track_list'])
+        for out, st in zip(outputs, status):
+            if st == 'failed': continue
+            try: write_cue(out['cue_path'], out['out_path'], job['title'], table, output_spec(out['format'])['cue_type'])
+            except: pass
+    seconds = time.perf_counter() - started
+    stats = {'taf': os.path.basename(taf.path), 'out': os.path.basename(job['out_files'][0]),
+             'seconds': round(seconds, 3), 'bytes': taf.audio_size, 'audio_seconds': round(taf.duration, 3),
+             'speed': round(taf.duration / seconds, 1) if ok and seconds > 0 else None,
+             'ok': ok, 'verified': status[0] == 'verified', 'status': status}  # ok None = nichts kodiert
+    return logs, taf, stats
+
+def _convert_job_worker(job):
+    return convert_job(job, _worker_progress)
+
+def apply_playback(entry, taf, track_list):
+    """Dauer, Laufzeit (Minuten) und Kapitel-Sprungtabelle in den Jukebox-Eintrag schreiben."""
+    info = playback_info(taf, track_list)
+    if not info: return False
+    entry['meta']['runtime'] = info['runtime']
+    entry['duration'] = info['duration']; entry['chapters'] = info['chapters']
+    return True
+
+def add_to_catalog(catalog, job, entry, taf=None, out=None):
+    """
+    Eintrag nur übernehmen, wenn alle Audiodateien geschrieben wurden; sofort speichern.
+    `out` = Ausgabe eines zusätzlichen Profils (job['extra']), sonst die Haupt-Ausgabe.
+    """
+    out = out or job
+    if all(os.path.exists(f) for f in out['out_files']):
+        if taf is not None: apply_playback(entry, taf, job['track_list'])
+        catalog.upsert(entry)
+        catalog.save()
+
+# ==========================================
+# TEIL 6: ORDNER ÜBERWACHEN (DIENST-MODUS)
+# ==========================================
+
+def _inotify_open(folder):
+    """Linux: inotify-Deskriptor für `folder` (nur zum Aufwecken), sonst None -> reines Polling."""
+    if not sys.platform.startswith("linux"): return None
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0: return None
+        IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_TO, IN_CREATE = 0x2, 0x8, 0x80, 0x100
+        if libc.inotify_add_watch(fd, os.fsencode(folder), IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE) < 0:
+            os.close(fd); return None
+        return fd
+    except: return None
+
+def _taf_complete(path, size):
+    """Liegt so viel Audio vor, wie der Header verspricht? (Kopie noch nicht fertig -> False)"""
+    try:
+        with open(path, "rb") as f: header = parse_taf_header(f.read(HEADER_SIZE))
+    except OSError: return False
+    if header and header.audio_length: return size >= HEADER_SIZE + header.audio_length
+    return size > HEADER_SIZE
+
+class FolderWatcher:
+    """
+    Findet neue oder geänderte TAFs in `folder`. Eine Datei gilt erst als fertig, wenn
+    Größe und Änderungszeit WATCH_SETTLE Sekunden stabil sind und das im Header
+    angegebene Audio komplett vorliegt. inotify weckt nur früher auf; geprüft wird
+    immer per stat, das funktioniert auch auf Netzlaufwerken.
+    """
+    def __init__(self, folder, known=()):
+        self.folder = folder
+        self.seen = {}     # Pfad -> (Größe, mtime_ns) bereits verarbeitet
+        self.pending = {}  # Pfad -> ((Größe, mtime_ns), seit)
+        for path in known:
+            try: self.seen[path] = self._stamp(path)
+            except OSError: pass
+        self.fd = _inotify_open(folder)
+        self.mode = "inotify" if self.fd is not None else f"Polling alle {WATCH_POLL_INTERVAL}s"
+        self._stop = threading.Event()
+        # Self-Pipe: weckt select() beim Beenden sofort auf (nur mit inotify, also unter Linux)
+        self._wake = os.pipe() if self.fd is not None else None
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+
+    def wait(self):
+        """Schlafen bis zum nächsten Scan; mit inotify aufwachen, sobald sich im Ordner etwas tut."""
+        if self.pending: timeout = 1
+        else: timeout = WATCH_RESCAN_INTERVAL if self.fd is not None else WATCH_POLL_INTERVAL
+        if self.fd is None:
+            self._stop.wait(timeout); return
+        if self.fd in select.select([self.fd, self._wake[0]], [], [], timeout)[0]:
+            try:
+                while os.read(self.fd, 65536): pass
+            except OSError: pass  # BlockingIOError = alles gelesen
+
+    def interrupt(self):
+        """Ein laufendes wait() sofort beenden (aus einem anderen Thread)."""
+        self._stop.set()
+        if self._wake: os.write(self._wake[1], b"x")
+
+    def poll(self):
+        """Pfade, die seit dem letzten Aufruf fertig geschrieben wurden."""
+        now = time.monotonic(); ready = []
+        current = set(glob.glob(os.path.join(self.folder, "*.taf")))
+        for path in current:
+            try: stamp = self._stamp(path)
+            except OSError: continue
+            if self.seen.get(path) == stamp: continue
+            old = self.pending.get(path)
+            if not old or old[0] != stamp:
+                self.pending[path] = (stamp, now); continue
+            if now - old[1] < WATCH_SETTLE or not _taf_complete(path, stamp[0]): continue
+            del self.pending[path]
+            self.seen[path] = stamp
+            ready.append(path)
+        # Gelöschte Dateien vergessen
+        for table in (self.pending, self.seen):
+            for path in [p for p in table if p not in current]: del table[path]
+        return sorted(ready)
+
+    def close(self):
+        """Erst aufrufen, wenn kein Thread mehr in wait() steckt (siehe interrupt)."""
+        for fd in ((self.fd,) + (self._wake or ())):
+            if fd is not None: os.close(fd)
+        self.fd = self._wake = None
+
+def watch_folder(args, catalog_path, journal, cache, stats, pool, progress_queue, jobs, known):
+    """
+    Dienst-Modus: ein Watcher-Thread legt fertig geschriebene TAFs in eine begrenzte
+    Queue, der Hauptthread verarbeitet sie stapelweise und aktualisiert die jukebox.json.
+    Läuft bis Strg+C bzw. SIGTERM.
+    """
+    watcher = FolderWatcher(SOURCE_DIR, known)
+    pending = queue.Queue(maxsize=WATCH_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def produce():
+        while not stop.is_set():
+            watcher.wait()
+            if stop.is_set(): break
+            for path in watcher.poll():
+                # Volle Queue bremst den Watcher, statt Dateien zu verlieren
+                while not stop.is_set():
+                    try: pending.put(path, timeout=1); break
+                    except queue.Full: continue
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    # SIGTERM (systemd, docker stop) wie Strg+C behandeln -> sauberes Ende mit Bericht.
+    # Geforkte Worker erben den Handler: dort normal sterben statt KeyboardInterrupt im Job
+    main_pid = os.getpid()
+    def terminate(signum, _frame):
+        if os.getpid() == main_pid: raise KeyboardInterrupt
+        signal.signal(signum, signal.SIG_DFL); os.kill(os.getpid(), signum)
+    signal.signal(signal.SIGTERM, terminate)
+    print(f"\n👀 Überwache {os.path.abspath(SOURCE_DIR)} ({watcher.mode}) – Strg+C beendet.")
+    try:
+        while True:
+            try: batch = [pending.get(timeout=1)]
+            except queue.Empty: continue
+            while len(batch) < WATCH_BATCH_SIZE:
+                try: batch.append(pending.get_nowait())
+                except queue.Empty: break
+            batch = sorted({p for p in batch if os.path.exists(p)})
+            if not batch: continue
+            print(f"\n📥 {len(batch)} neue Datei(en): {', '.join(os.path.basename(p) for p in batch)}")
+            # Katalog frisch laden, damit zwischendurch gemachte Änderungen erhalten bleiben
+            catalog = Catalog(catalog_path)
+            for tree in getattr(args, 'trees', ()): tree.reload()
+            try: process_files(batch, args, catalog, journal, cache, stats, pool, progress_queue, jobs, prune=False)
+            except Exception as e: print(f"✗ Fehler bei der Verarbeitung: {e}")
+            catalog.save()
+            print(f"✅ jukebox.json aktualisiert ({len(catalog.entries)} Einträge).", flush=True)
+    except KeyboardInterrupt:
+        print("\n⏹️  Überwachung beendet.")
+    finally:
+        # Erst den Watcher-Thread beenden, dann die Deskriptoren schließen (sonst liest er ein
+        # geschlossenes bzw. schon neu vergebenes fd)
+        stop.set(); watcher.interrupt()
+        producer.join(5)
+        if not producer.is_alive(): watcher.close()
+
+# ==========================================
+# TEIL 7: VERTEILTER BETRIEB (MEHRERE RECHNER)
+# ==========================================
+
+class WorkQueue:
+    """
+    Job-Queue in einem gemeinsamen Ordner (z.B. auf dem NAS), ohne Server und ohne Dateisperren:
+      leases/<taf>.lease   Belegung durch einen Worker; gültig, solange die Datei jünger als DIST_LEASE_TTL ist
+      done/<taf>.json      Katalog-Fragment einer fertigen TAF (Einträge + Journal-Zeilen)
+      failed/<taf>.json    Fehlerbericht
+      names/<dateiname>    vergebene Ausgabe-Namen (Inhalt = tagId des Besitzers)
+      work/                Zwischenstände der laufenden Worker
+    Belegen geht über O_EXCL, Übernehmen abgelaufener Leases über rename. Im schlimmsten Fall
+    (zwei Worker übernehmen gleichzeitig) wird eine TAF doppelt kodiert - die Ausgaben sind atomar.
+    """
+    def __init__(self, root, worker_id=None):
+        self.root = root
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        for sub in ('leases', 'done', 'failed', 'names', 'work'): os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def _path(self, sub, name):
+        return os.path.join(self.root, sub, name)
+
+    @staticmethod
+    def _create(path, text):
+        """Datei nur anlegen, wenn sie noch nicht existiert (atomar, auch auf NFS/SMB)."""
+        try: fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError: return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f: f.write(text)
+        return True
+
+    def _write(self, path, data):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(data, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def state(self, key):
+        if os.path.exists(self._path('done', key + ".json")): return 'done'
+        if os.path.exists(self._path('failed', key + ".json")): return 'failed'
+        return None
+
+    def claim(self, key):
+        """Versucht, die TAF `key` zu belegen. Leases abgestürzter Worker werden nach Ablauf übernommen."""
+        lease = self._path('leases', key + ".lease")
+        for _ in range(2):
+            if self._create(lease, self.worker_id): return True
+            try: age = time.time() - os.stat(lease).st_mtime
+            except FileNotFoundError: continue
+            if age < DIST_LEASE_TTL: return False
+            # Nur EIN Worker schafft das Umbenennen der abgelaufenen Lease und darf neu belegen
+            stale = f"{lease}.{self.worker_id.replace(':', '_')}.stale"
+            try: os.rename(lease, stale)
+            except FileNotFoundError: return False
+            os.remove(stale)
+        return False
+
+    def renew(self, key):
+        try: os.utime(self._path('leases', key + ".lease"))
+        except OSError: pass
+
+    def release(self, key):
+        lease = self._path('leases', key + ".lease")
+        try:
+            with open(lease, encoding='utf-8') as f: owner = f.read()
+            if owner == self.worker_id: os.remove(lease)
+        except OSError: pass
+
+    def holding(self, key):
+        """Hält die Lease während der Arbeit am Leben (Hintergrund-Thread). Gibt eine Stop-Funktion zurück."""
+        stop = threading.Event()
+        def beat():
+            while not stop.wait(DIST_LEASE_TTL / 4): self.renew(key)
+        threading.Thread(target=beat, daemon=True).start()
+        return stop.set
+
+    def finish(self, key, fragment):
+        self._write(self._path('done', key + ".json"), fragment)
+        self.release(key)
+
+    def fail(self, key, report):
+        self._write(self._path('failed', key + ".json"), report)
+        self.release(key)
+
+    def claim_name(self, base, owner):
+        """Ausgabe-Namen für `owner` (tagId) belegen; True, wenn er frei war oder schon `owner` gehört."""
+        path = self._path('names', base)
+        if self._create(path, owner): return True
+        try:
+            with open(path, encoding='utf-8') as f: return f.read() == owner
+        except OSError: return False
+
+    def _load(self, sub):
+        items = []
+        for path in sorted(glob.glob(self._path(sub, "*.json"))):
+            try:
+                with open(path, encoding='utf-8') as f: items.append(json.load(f))
+            except (OSError, ValueError): pass
+        return items
+
+    def fragments(self):
+        return self._load('done')
+
+    def failures(self):
+        return self._load('failed')
+
+def run_worker(args, worker_id=None):
+    """
+    Ein Worker: belegt nacheinander freie TAFs aus SOURCE_DIR, konvertiert sie und legt pro TAF
+    ein Katalog-Fragment in der Queue ab. Endet, wenn jede TAF fertig oder fehlgeschlagen ist;
+    solange andere Worker noch TAFs halten, wird gewartet (falls sie abstürzen, läuft ihre Lease ab).
+    """
+    wq = WorkQueue(args.worker, worker_id)
+    stats = RunStats(None)
+    done = 0
+    try:
+        while True:
+            pending = claimed = False
+            for path in sorted(glob.glob(os.path.join(SOURCE_DIR, "*.taf"))):
+                key = os.path.basename(path)
+                if wq.state(key): continue
+                pending = True
+                if not wq.claim(key): continue
+                claimed = True
+                stop = wq.holding(key)
+                work = wq._path('work', key)
+                try:
+                    print(f"🛠️  [{wq.worker_id}] {key}", flush=True)
+                    catalog = Catalog(work + ".json")
+                    journal = RunJournal(work + ".journal.jsonl")
+                    process_files([path], args, catalog, journal, None, stats, prune=False, names=wq)
+                    if catalog.entries:
+                        wq.finish(key, {'taf': key, 'worker': wq.worker_id, 'entries': catalog.entries,
+                                        'journal': list(journal.records.values())})
+                        done += 1
+                    else: wq.fail(key, {'taf': key, 'worker': wq.worker_id, 'error': "keine Ausgabe erzeugt"})
+                except Exception as e:
+                    wq.fail(key, {'taf': key, 'worker': wq.worker_id, 'error': str(e)})
+                finally:
+                    stop(); wq.release(key)
+                    for leftover in (work + ".json", work + ".journal.jsonl"):
+                        if os.path.exists(leftover): os.remove(leftover)
+            if not pending: break
+            if not claimed: time.sleep(DIST_POLL_INTERVAL)
+    except KeyboardInterrupt: pass
+    print(f"🏁 [{wq.worker_id}] {done} TAF(s) konvertiert.", flush=True)
+
+def start_workers(args, count, catalog):
+    """
+    --worker: Tonie-DB einmal pro Rechner laden, vorhandene Katalog-Namen in der Queue belegen
+    und `count` Worker-Prozesse starten. Gibt nach deren Ende (fertig, fehlgeschlagen, offen) zurück.
+    """
+    wq = WorkQueue(args.worker)
+    for entry in catalog.entries:
+        for name in [entry.get('imageFileName')] + (entry.get('playlistFileNames') or [])[:1]:
+            if name and str(entry.get('tagId', '')).startswith("auto_"):
+                wq.claim_name(os.path.splitext(name)[0], entry['tagId'])
+    # SQLite-Dateien nicht gemeinsam auf dem NAS beschreiben: DB-Kopie lokal, Caches aus
+    args.db_path = os.path.join(tempfile.gettempdir(), f"taf_jukebox_{hashlib.sha1(os.path.abspath(SOURCE_DIR).encode()).hexdigest()[:8]}.sqlite")
+    load_tonies_db(args.db_url, args.offline, args.db_path).close()
+    args.offline = True; args.no_cache = True
+    print(f"🧑‍🏭 Starte {count} Worker auf {socket.gethostname()} (Queue: {os.path.abspath(args.worker)})...")
+    procs = [multiprocessing.Process(target=run_worker, args=(args,)) for _ in range(count)]
+    for p in procs: p.start()
+    try:
+        for p in procs: p.join()
+    except KeyboardInterrupt:
+        for p in procs: p.join()
+    keys = [os.path.basename(p) for p in glob.glob(os.path.join(SOURCE_DIR, "*.taf"))]
+    states = [wq.state(k) for k in keys]
+    return states.count('done'), states.count('failed'), states.count(None)
+
+def merge_queue(queue_dir, catalog, journal):
+    """--merge: alle Katalog-Fragmente der Queue in jukebox.json und Journal übernehmen."""
+    wq = WorkQueue(queue_dir)
+    fragments = wq.fragments()
+    for frag in fragments:
+        for entry in frag.get('entries', []): catalog.upsert(entry)
+        for rec in frag.get('journal', []): journal.adopt(rec)
+    catalog.save()
+    failures = wq.failures()
+    for rep in failures: print(f"   ✗ {rep.get('taf')}: {rep.get('error')} ({rep.get('worker')})")
+    print(f"🧩 {len(fragments)} Fragmente zusammengeführt, {len(failures)} fehlgeschlagen -> {catalog.path}")
+    return len(failures)
+
+# ==========================================
+# TEIL 8: MAIN
+# ==========================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TAF zu Jukebox (Scrape & Convert)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Anzahl paralleler Worker (Standard: Anzahl CPU-Kerne)")
+    parser.add_argument("--net-jobs", type=int, default=SCRAPE_HTTP_WORKERS,
+                        help="Parallele Netzwerk-Abrufe (Datenbank, Produktseiten, Cover)")
+    parser.add_argument("--trust-header-hash", action="store_true",
+                        help="SHA-1 aus dem TAF-Header übernehmen statt die Datei vorab zu hashen")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="Analyse- & Metadaten-Cache verwerfen und neu aufbauen")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Keinen Cache lesen oder schreiben")
+    parser.add_argument("--db-url", default=TONIES_DB_URL,
+                        help="Quelle der Tonie-Datenbank (toniesV2.json)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Nur die lokale Kopie der Tonie-Datenbank benutzen")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default=OUTPUT_FORMAT,
+                        help="Ausgabeformat: mp3 (Neu-Encode) oder opus/ogg/m4a (verlustfrei umverpackt, mit Kapiteln)")
+    parser.add_argument("--split-chapters", action="store_true",
+                        help="Eine Audiodatei pro Kapitel statt einer großen Datei mit CUE")
+    parser.add_argument("--rebuild-catalog", action="store_true",
+                        help="Automatische Einträge der jukebox.json verwerfen und alle TAFs neu verarbeiten")
+    parser.add_argument("--report", metavar="DATEI",
+                        help="Laufzeiten pro Phase und Datei als JSON (oder .csv) speichern")
+    parser.add_argument("--events", metavar="DATEI",
+                        help="Fortschritts-Ereignisse als JSON-Zeilen an DATEI anhängen")
+    parser.add_argument("--watch", action="store_true",
+                        help="Dienst-Modus: Ordner überwachen und neue TAFs automatisch verarbeiten")
+    parser.add_argument("--verify", action="store_true",
+                        help="Fertige Ausgaben gegen die TAF-Dauer prüfen (ohne neu zu kodieren) und Fehlerhafte zum Neu-Erzeugen markieren")
+    parser.add_argument("--profile", action="append", default=[], metavar="NAME",
+                        help=f"Zusätzliches Ausgabe-Profil in eigenem Ordner, aus demselben Decode ({', '.join(OUTPUT_PROFILES)} "
+                             "oder name=format[:bitrate][:mono][:samplerate]); mehrfach möglich")
+    parser.add_argument("--taxonomy", metavar="DATEI",
+                        help=f"Tag-Taxonomie (JSON: Kategorie -> Keywords), Standard: {TAXONOMY_FILE} im Quellordner")
+    parser.add_argument("--retag", action="store_true",
+                        help="Nur die Tags aller automatischen Einträge der jukebox.json neu berechnen")
+    parser.add_argument("--verify-taf", action="store_true",
+                        help=f"Alle TAFs auf Beschädigung prüfen (Header, Hash, OGG-Pages, CRC) und Bericht schreiben ({TAF_VERIFY_REPORT})")
+    parser.add_argument("--quarantine", action="store_true",
+                        help=f"Defekte TAFs nach {QUARANTINE_DIR}/ verschieben (mit --verify-taf oder vor jeder Konvertierung neuer Dateien)")
+    parser.add_argument("--worker", metavar="QUEUE",
+                        help="Verteilter Modus: TAFs aus einer gemeinsamen Queue (Ordner, z.B. auf dem NAS) abarbeiten; -j = Anzahl Worker-Prozesse")
+    parser.add_argument("--merge", metavar="QUEUE",
+                        help="Katalog-Fragmente der Worker aus der Queue zur jukebox.json zusammenführen")
+    parser.add_argument("--match", action="store_true",
+                        help=f"Für TAFs, deren Hash nicht in der Tonie-DB steht, Kandidaten mit Sicherheit auflisten (offline, Bericht: {FP_MATCH_REPORT})")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="Am Ende nicht auf Enter warten (für geplante Aufgaben)")
+    return parser.parse_args(argv)
+
+def open_pool(jobs):
+    """Worker-Prozesse mit fester ProgressBoard-Zeile; gibt (Pool, Manager, Fortschritts-Queue) zurück."""
+    print(f"⚙️  Starte {jobs} Worker...")
+    manager = multiprocessing.Manager()
+    slot_queue = manager.Queue()
+    for slot in range(jobs): slot_queue.put(slot)
+    progress_queue = manager.Queue()
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                               initargs=(slot_queue, progress_queue))
+    return pool, manager, progress_queue
+
+def entry_base(entry):
+    """
+    Vergebener Dateinamen-Stamm eines Katalog-Eintrags: 'baseName', bei älteren Einträgen aus
+    Cover bzw. erster Datei, bei Kapitel-Dateien ohne das angehängte ' - NN'.
+    """
+    if entry.get('baseName'): return entry['baseName']
+    names = entry.get('playlistFileNames') or []
+    if entry.get('imageFileName'): return os.path.splitext(entry['imageFileName'])[0]
+    base = os.path.splitext(names[0])[0]
+    return re.sub(r" - \d+$", "", base) if len(names) > 1 else base
+
+def owns_files(catalog, entry):
+    """Nennt der vorhandene Katalog-Eintrag dieser TAF (tagId) genau die Dateien des neuen Eintrags?"""
+    old = catalog.get(entry['tagId'])
+    return bool(old) and sorted(old.get('playlistFileNames') or []) == sorted(entry['playlistFileNames'])
+
+def claim_name(used_bases, base, owner):
+    """Dateinamen belegen: lokal über ein Set, im verteilten Modus über die gemeinsame WorkQueue."""
+    if hasattr(used_bases, 'claim_name'): return used_bases.claim_name(base, owner)
+    if base in used_bases: return False
+    used_bases.add(base)
+    return True
+
+def build_job(taf, info, args, used_bases):
+    """Dateinamen, Encode-Auftrag und Jukebox-Eintrag für eine TAF. Gibt (Job, Eintrag, Cover-URL) zurück."""
+    title = info['title']
+    stem = os.path.splitext(os.path.basename(taf.path))[0]
+    orig_base = clean_filename(title)
+    if not orig_base or title == "Unbekannt": orig_base = stem
+    # Parallele Worker dürfen nie in dieselbe Datei schreiben
+    tag_id = f"auto_{taf.hash[:10] if taf.hash else 'unknown'}"
+    if not claim_name(used_bases, orig_base, tag_id):
+        orig_base = f"{orig_base} ({stem})"
+        claim_name(used_bases, orig_base, tag_id)
+
+    # Meta Dictionary für Converter
+    convert_meta = {k: info[k] for k in ('title', 'series', 'description', 'age', 'genre')}
+
+    # Pfade
+    ext = OUTPUT_FORMATS[args.format]['ext']
+    out_path = os.path.join(OUTPUT_DIR, orig_base + ext)
+    out_files = [out_path]
+    split = args.split_chapters and len(taf.chapters) > 1
+    if split:
+        # Eine Datei pro Kapitel: "<Titel> - 01.mp3", "<Titel> - 02.mp3", ...
+        out_path = os.path.join(OUTPUT_DIR, orig_base.replace("%", "%%") + " - %02d" + ext)
+        out_files = [os.path.join(OUTPUT_DIR, f"{orig_base} - {n:02d}{ext}") for n in range(1, len(taf.chapters) + 1)]
+    jpg_path = os.path.join(OUTPUT_DIR, f"{orig_base}.jpg")
+    cue_path = os.path.join(OUTPUT_DIR, f"{orig_base}.cue")
+
+    # Cover: vorhandenes benutzen, fehlendes lädt die Cover-Stufe
+    has_cover = os.path.exists(jpg_path)
+    job = {
+        'taf': taf, 'out_path': out_path, 'out_files': out_files, 'format': args.format, 'split': split,
+        'cue_path': cue_path, 'jpg_path': jpg_path,
+        'cover_path': jpg_path if has_cover else None, 'convert_meta': convert_meta,
+        'title': title, 'track_list': info['tracks']
+    }
+
+    # JUKEBOX ENTRY
+    tags = detect_tags(title, info['description'], info['genre'])
+    entry = {
+        "tagId": tag_id,
+        "name": title,
+        "baseName": orig_base,
+        "playlistFileNames": [os.path.basename(f) for f in out_files],
+        "imageFileName": os.path.basename(jpg_path) if has_cover else None,
+        "meta": {
+            "description": info['description'],
+            "age_recommendation": info['age'],
+            "genre": info['genre'],
+            "series": info['series'],
+            "runtime": info['runtime']
+        },
+        "filter_age": info['age'],
+        "tags": tags
+    }
+    # Über den Fingerprint zugeordnet (nicht per Hash): zum Nachprüfen markieren
+    if info.get('match'): entry['meta']['match'] = info['match']
+    # Zusätzliche Profile: gleiche Dateinamen im eigenen Ordner, eigener Katalog-Eintrag
+    job['extra'] = []
+    for tree in getattr(args, 'trees', ()):
+        spec = tree.spec
+        names = [os.path.splitext(os.path.basename(f))[0] + spec['ext'] for f in out_files]
+        x_jpg = os.path.join(spec['dir'], os.path.basename(jpg_path))
+        x_has_cover = os.path.exists(x_jpg)
+        x_entry = {**entry, "playlistFileNames": names, "imageFileName": os.path.basename(x_jpg) if x_has_cover else None,
+                   "meta": dict(entry['meta'])}
+        job['extra'].append({
+            'name': spec['name'], 'format': spec, 'out_files': [os.path.join(spec['dir'], n) for n in names],
+            'out_path': os.path.join(spec['dir'], os.path.splitext(os.path.basename(out_path))[0] + spec['ext']),
+            'cue_path': os.path.join(spec['dir'], os.path.basename(cue_path)), 'jpg_path': x_jpg,
+            'entry': x_entry,
+        })
+    return job, entry, None if has_cover else info['cover_url']
+
+async def run_pipeline(items, args, catalog, journal, cache, stats, pool, progress_queue, jobs, used_bases):
+    """
+    Gestaffelte Verarbeitung: Metadaten/Scraping -> Cover -> Encode -> Katalog, verbunden
+    über begrenzte Queues. Netzwerk-Stufen teilen sich args.net_jobs Threads, der Encode
+    läuft mit `jobs` Workern. Während eine Datei kodiert wird, werden Metadaten und Cover
+    der nächsten schon geladen. `items` = [(TafFile, Metadaten oder None)] in Dateireihenfolge.
+    """
+    loop = asyncio.get_running_loop()
+    net = ThreadPoolExecutor(args.net_jobs)
+    encoder = pool or ThreadPoolExecutor(1)
+    to_cover = asyncio.Queue(PIPELINE_QUEUE_SIZE); to_encode = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+    # Mehrere Worker-Prozesse teilen sich ein Terminal -> nur Log-Zeilen
+    live = sys.stdout.isatty() and not getattr(args, 'worker', None)
+    board = ProgressBoard(jobs, progress_queue, live=live) if pool else ProgressBoard(1, queue.Queue(), live=live)
+    log = board.log
+    session = make_http_session(args.net_jobs)
+    scrape_cache = ScrapeCache(":memory:" if args.no_cache else os.path.join(SOURCE_DIR, CACHE_FILE))
+    covers = CoverStore(os.path.join(SOURCE_DIR, COVER_CACHE_DIR))
+    state = {'db': None}; db_lock = asyncio.Lock()
+    pages = {}; cover_tasks = {}  # URL -> Task: jede Seite / jedes Cover nur einmal laden
+    browsers = BrowserPool(SCRAPE_CONCURRENCY)
+    header_only = {taf.path for taf, _ in items if not taf.analyzed}
+    n_cover = max(1, args.net_jobs)
+    trees = getattr(args, 'trees', [])
+
+    async def on_net(stage, func, *a):
+        started = time.perf_counter()
+        try: return await loop.run_in_executor(net, func, *a)
+        finally: stats.add(stage, time.perf_counter() - started)
+
+    async def get_db():
+        # Datenbank erst laden, wenn die erste Datei ohne Cache-Metadaten ankommt
+        async with db_lock:
+            if state['db'] is None:
+                state['db'] = await on_net("datenbank", load_tonies_db, args.db_url, args.offline,
+                                           getattr(args, 'db_path', None))
+        return state['db']
+
+    async def fetch_page(url):
+        data = scrape_cache.get(url)
+        if data is not None: return data
+        data = await on_net("scraping", scrape_fast, session, url)
+        if len(data.get('description') or '') < 20 and PLAYWRIGHT_AVAILABLE:
+            # Browser nur für Seiten ohne brauchbare Beschreibung
+            try: rendered = await browsers.scrape(url)
+            except Exception as e:
+                log(f"   (Browser Fehler: {e})"); rendered = {}
+            data = {**data, **{k: v for k, v in rendered.items() if v}}
+        if data: scrape_cache.put(url, data)
+        return data
+
+    async def lookup(taf, info):
+        # Unbekannte aus dem Cache bekommen eine neue Chance über den Fingerprint-Index
+        if info is not None and not (FINGERPRINT_MATCHING and info.get('title') == "Unbekannt"): return info, True
+        db = await get_db()
+        key = taf.hash; match = None
+        meta = db.get(key, {})
+        if meta: learn_fingerprint(db, taf)
+        elif FINGERPRINT_MATCHING and (found := match_fingerprint(taf, db)):
+            log(f"   🔎 {os.path.basename(taf.path)}: " + ", ".join(f"{c['title']} ({c['confidence']:.0%})" for c in found[:3]))
+            if found[0]['confidence'] >= FP_MIN_CONFIDENCE:
+                match = found[0]; key = match['hash']; meta = db.get(key, {})
+        scraped = {}
+        if needs_scrape(meta):
+            url = meta['web']
+            if url not in pages: pages[url] = asyncio.ensure_future(fetch_page(url))
+            scraped[url] = await pages[url]
+        info = resolve_metadata(key, db, scraped)
+        if match: info['match'] = {'hash': match['hash'], 'confidence': match['confidence']}
+        if cache: cache.put_meta(taf.path, info)
+        return info, False
+
+    async def lookup_stage():
+        # Mehrere Dateien gleichzeitig nachschlagen, aber in Dateireihenfolge weitergeben
+        # (stabile Dateinamen bei gleichen Titeln)
+        window = deque()
+        async def release():
+            taf, task = window.popleft()
+            try: info, cached = await task
+            except Exception as e:
+                log(f"   ✗ Metadaten-Fehler {os.path.basename(taf.path)}: {e}")
+                info, cached = resolve_metadata(taf.hash, {}), False
+            job, entry, cover_url = build_job(taf, info, args, used_bases)
+            catalog.reserve(entry['tagId'])
+            for tree in trees: tree.catalog.reserve(entry['tagId'])
+            job['done'] = bool(taf.hash) and journal.is_done(taf.hash, args.format, entry['playlistFileNames'])
+            job['adopt'] = owns_files(catalog, entry)
+            for tree, x in zip(trees, job['extra']):
+                x['done'] = bool(taf.hash) and tree.journal.is_done(taf.hash, tree.spec['id'], x['entry']['playlistFileNames'])
+                x['adopt'] = owns_files(tree.catalog, x['entry'])
+            log(f"📄 {os.path.basename(taf.path)} -> {entry['name']}" + (" (Cache)" if cached else ""))
+            await to_cover.put((job, entry, info, cover_url))
+        for taf, info in items:
+            window.append((taf, asyncio.ensure_future(lookup(taf, info))))
+            if len(window) >= 2 * args.net_jobs: await release()
+        while window: await release()
+
+    async def cover_worker():
+        while (item := await to_cover.get()) is not None:
+            job, entry, info, url = item
+            if url:
+                if url not in cover_tasks: cover_tasks[url] = asyncio.ensure_future(on_net("cover", covers.fetch, url, session))
+                if await cover_tasks[url] and covers.place(url, job['jpg_path']):
+                    job['cover_path'] = job['jpg_path']
+                    entry['imageFileName'] = os.path.basename(job['jpg_path'])
+            for x in job['extra']:
+                if job['cover_path'] and link_file(job['cover_path'], x['jpg_path']):
+                    x['entry']['imageFileName'] = os.path.basename(x['jpg_path'])
+            await to_encode.put((job, entry, info))
+
+    async def encode_worker():
+        while (item := await to_encode.get()) is not None:
+            job, entry, info = item
+            started = time.perf_counter()
+            try:
+                if pool: logs, taf, file_stats = await loop.run_in_executor(pool, _convert_job_worker, job)
+                else: logs, taf, file_stats = await loop.run_in_executor(
+                    encoder, convert_job, job, lambda text: board.queue.put(('line', 0, text)))
+            except Exception as e:
+                logs, taf = [f"   ✗ Fehler: {e}"], job['taf']
+                file_stats = {'taf': os.path.basename(taf.path), 'out': os.path.basename(job['out_files'][0]), 'ok': False}
+            stats.add("encode", time.perf_counter() - started, size=taf.audio_size)
+            stats.file(**file_stats)
+            status = file_stats.get('status') or []
+            profiles = [x['name'] for x, st in zip(job['extra'], status[1:]) if st == 'ok']
+            log(f"{'✗' if file_stats.get('ok') is False else '✓'} {os.path.basename(job['out_files'][0])}"
+                + (f" (+ {', '.join(profiles)})" if profiles else ""))
+            for line in logs: log(line)
+            # Erst ins Journal, dann in den Katalog: ein Abbruch dazwischen kostet nur einen Prüflauf
+            if (file_stats.get('ok') or file_stats.get('verified')) and taf.hash:
+                journal.record(taf.hash, os.path.basename(taf.path), args.format, job['out_files'], taf.duration)
+            add_to_catalog(catalog, job, entry, taf)
+            for tree, x, st in zip(trees, job['extra'], status[1:]):
+                if st in ('ok', 'verified') and taf.hash:
+                    tree.journal.record(taf.hash, os.path.basename(taf.path), tree.spec['id'], x['out_files'], taf.duration)
+                add_to_catalog(tree.catalog, job, x['entry'], taf, x)
+            # Erst beim Encode analysierte Dateien (--trust-header-hash) nachträglich cachen
+            if cache and taf.path in header_only:
+                cache.put_analysis(taf)
+                cache.put_meta(taf.path, info)
+
+    async def feed():
+        await lookup_stage()
+        for _ in range(n_cover): await to_cover.put(None)
+        await asyncio.gather(*cover_workers)
+        for _ in range(jobs): await to_encode.put(None)
+
+    board.start()
+    cover_workers = [asyncio.ensure_future(cover_worker()) for _ in range(n_cover)]
+    try:
+        await asyncio.gather(feed(), *(encode_worker() for _ in range(jobs)))
+    finally:
+        board.stop()
+        await browsers.close()
+        session.close(); net.shutdown(wait=False)
+        if encoder is not pool: encoder.shutdown()
+        scrape_cache.close()
+        if isinstance(state['db'], ToniesDb): state['db'].close()
+
+def find_duplicates(tafs):
+    """{Index des Duplikats: Index der ersten TAF mit demselben Audio-Hash} (Dateireihenfolge)."""
+    first = {}; dups = {}
+    for i, taf in enumerate(tafs):
+        if not taf.hash: continue
+        if taf.hash in first: dups[i] = first[taf.hash]
+        else: first[taf.hash] = i
+    return dups
+
+def report_duplicates(dups, tafs, catalog, stats):
+    """
+    Zeigt pro Duplikat, auf welche Ausgabe es verweist, und was das Überspringen gespart hat:
+    Speicher = Größe der gemeinsamen Ausgabe, Encode-Zeit = gemessene Zeit des Originals
+    (bzw. geschätzt über das mittlere Tempo dieses Laufs, wenn das Original schon fertig war).
+    """
+    encoded = {r['taf']: r for r in stats.files if r.get('ok')}
+    speeds = [r['speed'] for r in encoded.values() if r.get('speed')]
+    speed = sum(speeds) / len(speeds) if speeds else None
+    saved_bytes = 0; saved_seconds = 0.0
+    for dup, orig in sorted(dups.items()):
+        entry = catalog.get(f"auto_{tafs[orig].hash[:10]}") or {}
+        names = entry.get('playlistFileNames') or []
+        paths = [os.path.join(OUTPUT_DIR, n) for n in names]
+        if not paths or not all(os.path.exists(p) for p in paths):
+            print(f"   ♻️  {os.path.basename(tafs[dup].path)} = {os.path.basename(tafs[orig].path)} (Original noch nicht fertig)")
+            continue
+        saved_bytes += sum(os.path.getsize(p) for p in paths)
+        rec = encoded.get(os.path.basename(tafs[orig].path))
+        if rec: saved_seconds += rec['seconds']
+        elif speed: saved_seconds += tafs[orig].duration / speed
+        print(f"   ♻️  {os.path.basename(tafs[dup].path)} = {os.path.basename(tafs[orig].path)} -> {names[0]}")
+    stats.emit('dedup', duplicates=len(dups), saved_bytes=saved_bytes, saved_seconds=round(saved_seconds, 3))
+    print(f"♻️  Duplikate: {len(dups)} TAFs nicht erneut kodiert, {saved_bytes / 1024 / 1024:.1f} MB Speicher"
+          + (f" und ca. {saved_seconds:.1f}s Encode-Zeit gespart." if saved_seconds else " gespart."))
+
+def process_files(taf_files, args, catalog, journal, cache, stats, pool=None, progress_queue=None, jobs=1, prune=True,
+                  names=None):
+    """
+    Ein Durchgang über `taf_files`: Analyse, Metadaten, Cover, Konvertierung.
+    Fertige Titel landen sofort im Katalog. Mit `prune` werden Cache-Einträge
+    für Dateien, die nicht mehr in der Liste stehen, entfernt (nur beim vollen Lauf).
+    `names` ersetzt die Dateinamen-Vergabe aus dem Katalog (verteilter Modus: WorkQueue).
+    """
+    # 3. Analyse: Hash, Page-Index, Kapitel in einem Durchlauf (nur für Cache-Misses, parallel)
+    # Eigener Lesedurchgang vor dem Encode (Dedup/Journal brauchen den Hash); nur --trust-header-hash spart ihn
+    tafs = [None] * len(taf_files); resolved = [None] * len(taf_files)
+    if cache:
+        for i, taf_path in enumerate(taf_files):
+            tafs[i], resolved[i] = cache.get(taf_path)
+        if prune: cache.prune(taf_files)
+    todo = [i for i, taf in enumerate(tafs) if taf is None]
+    if getattr(args, 'quarantine', False) and todo:
+        # Neue/geänderte TAFs vor der Konvertierung komplett prüfen; defekte kommen gar nicht erst in die Pipeline
+        bad = {r['path'] for r in verify_tafs([taf_files[i] for i in todo], jobs, quarantine=True, pool=pool)}
+        keep = [i for i, p in enumerate(taf_files) if os.path.abspath(p) not in bad]
+        taf_files = [taf_files[i] for i in keep]
+        tafs = [tafs[i] for i in keep]; resolved = [resolved[i] for i in keep]
+        todo = [i for i, taf in enumerate(tafs) if taf is None]
+    stats.begin("analyse")
+    print(f"🔑 Analysiere {len(todo)} Dateien ({len(taf_files) - len(todo)} aus dem Cache)...")
+    analyze = _analyze_taf_trusted if args.trust_header_hash else analyze_taf
+    paths = [taf_files[i] for i in todo]
+    results = pool.map(analyze, paths, chunksize=4) if pool else map(analyze, paths)
+    for i, taf in zip(todo, results):
+        tafs[i] = taf
+        if cache: cache.put_analysis(taf)
+    stats.end("analyse", len(todo), sum(os.path.getsize(p) for p in paths))
+
+    # Titel überspringen, die im Katalog stehen und laut Journal fertig konvertiert sind
+    def finished(taf):
+        tag_id = f"auto_{taf.hash[:10]}" if taf.hash else None
+        entry = catalog.get(tag_id) if tag_id else None
+        if not (entry and journal.is_done(taf.hash, args.format, entry.get('playlistFileNames') or [])): return False
+        # Zusätzliche Profile müssen ebenfalls fertig sein
+        for tree in getattr(args, 'trees', ()):
+            x = tree.catalog.get(tag_id)
+            if not (x and tree.journal.is_done(taf.hash, tree.spec['id'], x.get('playlistFileNames') or [])): return False
+        return True
+    # Gleiches Audio (gleicher SHA-1) nur einmal kodieren: Duplikate verweisen auf die Ausgabe der ersten TAF
+    dups = find_duplicates(tafs)
+    skip = set(dups)
+    if dups: print(f"♻️  {len(dups)} Duplikate mit gleichem Audio werden nicht erneut kodiert.")
+    active = [i for i, taf in enumerate(tafs) if i not in skip and not finished(taf)]
+    done = [i for i in range(len(tafs)) if i not in skip and i not in active]
+    if done:
+        print(f"📚 {len(done)} Titel schon im Katalog, {len(active)} zu verarbeiten.")
+        # Ältere Einträge ohne Sprungtabelle (oder mit den früheren, unbrauchbaren Byte-Offsets)
+        # aus dem vorhandenen Page-Index ergänzen, ohne neu zu kodieren
+        filled = 0
+        for i in done:
+            entry = catalog.get(f"auto_{tafs[i].hash[:10]}")
+            if not isinstance(entry.get('meta'), dict): continue
+            if 'duration' in entry and not any('offset' in ch for ch in entry.get('chapters') or []): continue
+            if not tafs[i].analyzed: tafs[i].analyze()
+            tracks = (resolved[i] or {}).get('tracks') or []
+            if apply_playback(entry, tafs[i], tracks): filled += 1
+        if filled:
+            catalog.save()
+            print(f"⏱️  Laufzeit & Kapitel für {filled} vorhandene Einträge ergänzt.")
+
+    if active:
+        # Dateinamen der übrigen Katalog-Einträge sind vergeben
+        active_tags = {f"auto_{tafs[i].hash[:10]}" for i in active if tafs[i].hash}
+        used_bases = names if names is not None else \
+                     {entry_base(e) for e in catalog.entries if e.get('tagId') not in active_tags and e.get('playlistFileNames')}
+
+        # 4.-6. Metadaten, Cover, Konvertierung & Katalog als Pipeline
+        print(f"\n🚚 Verarbeite {len(active)} Dateien (Netzwerk {args.net_jobs} parallel, Encode {jobs} parallel)...")
+        stats.begin("pipeline")
+        asyncio.run(run_pipeline([(tafs[i], resolved[i]) for i in active], args, catalog, journal, cache, stats,
+                                 pool, progress_queue, jobs, used_bases))
+        stats.end("pipeline", len(active))
+    if dups: report_duplicates(dups, tafs, catalog, stats)
+
+def verify_tafs(taf_files, jobs, report_path=None, quarantine=False, pool=None):
+    """
+    --verify-taf: prüft alle TAFs parallel mit verify_taf() und schreibt den Bericht als JSON.
+    Mit `quarantine` werden defekte Dateien (samt Sidecar) nach QUARANTINE_DIR verschoben.
+    Gibt die Berichte der defekten Dateien zurück.
+    """
+    print(f"🔬 Prüfe {len(taf_files)} TAF-Dateien (Header, Hash, Pages, Granules, CRC)...")
+    started = time.perf_counter(); results = []
+    ex = pool or (ProcessPoolExecutor(jobs) if jobs > 1 and len(taf_files) > 1 else ThreadPoolExecutor(1))
+    try:
+        for fut in as_completed([ex.submit(verify_taf, p) for p in taf_files]):
+            r = fut.result(); results.append(r)
+            if not r['ok']: print(f"   ✗ {r['file']}: {'; '.join(r['errors'][:3])}")
+    finally:
+        if ex is not pool: ex.shutdown()
+    seconds = time.perf_counter() - started
+    results.sort(key=lambda r: r['file'])
+    bad = [r for r in results if not r['ok']]
+
+    if quarantine and bad:
+        target_dir = os.path.join(SOURCE_DIR, QUARANTINE_DIR)
+        os.makedirs(target_dir, exist_ok=True)
+        for r in bad:
+            target = os.path.join(target_dir, r['file'])
+            n = 1
+            while os.path.exists(target):
+                n += 1; target = os.path.join(target_dir, f"{os.path.splitext(r['file'])[0]} ({n}).taf")
+            try:
+                shutil.move(r['path'], target)
+                if os.path.exists(_sidecar_path(r['path'])): os.remove(_sidecar_path(r['path']))
+                r['quarantined'] = os.path.abspath(target)
+                print(f"   🚧 {r['file']} -> {QUARANTINE_DIR}/")
+            except OSError as e: print(f"   ⚠️  {r['file']} nicht verschoben: {e}")
+
+    if report_path:
+        report = {'checked': len(results), 'ok': len(results) - len(bad), 'bad': len(bad),
+                  'seconds': round(seconds, 3), 'files': results}
+        with open(report_path, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2, ensure_ascii=False)
+    size = sum(r['size'] for r in results)
+    print(f"{'✅' if not bad else '⚠️ '} {len(results) - len(bad)} in Ordnung | ✗ {len(bad)} defekt | "
+          f"{size / 1024 / 1024:.0f} MB in {seconds:.1f}s ({size / 1024 / 1024 / max(seconds, 1e-6):.0f} MB/s)"
+          + (f" | Bericht: {report_path}" if report_path else ""))
+    return bad
+
+def match_tafs(taf_files, args, cache, report_path=None):
+    """
+    --match: Kandidaten aus dem Fingerprint-Index für alle TAFs, deren Hash nicht in der Tonie-DB steht.
+    Erkannte TAFs werden vorher als Profil gelernt. Braucht kein Netzwerk, sobald die DB-Kopie existiert.
+    Gibt die Ergebnisse pro unbekannter TAF zurück.
+    """
+    db = load_tonies_db(args.db_url, args.offline, getattr(args, 'db_path', None))
+    tafs = []
+    for path in taf_files:
+        taf = cache.get(path)[0] if cache else None
+        if taf is None:
+            taf = analyze_taf(path)
+            if cache: cache.put_analysis(taf)
+        tafs.append(taf)
+    unknown = []
+    for taf in tafs:
+        if db.get(taf.hash): learn_fingerprint(db, taf)
+        else: unknown.append(taf)
+    print(f"🔎 {len(unknown)} von {len(tafs)} TAFs nicht in der Tonie-DB, suche Kandidaten...")
+    results = []
+    for taf in unknown:
+        started = time.perf_counter()
+        found = match_fingerprint(taf, db)
+        ms = (time.perf_counter() - started) * 1000
+        name = os.path.basename(taf.path)
+        if not found: print(f"   ✗ {name}: keine Kandidaten ({ms:.1f} ms)")
+        else:
+            mark = "✓" if found[0]['confidence'] >= FP_MIN_CONFIDENCE else "?"
+            print(f"   {mark} {name} ({taf.duration / 60:.0f} min, {len(taf.chapters)} Kapitel, {ms:.1f} ms)")
+            for c in found: print(f"      {c['confidence']:4.0%}  {c['title']}  [{c['hash'][:10]}]")
+        results.append({'file': name, 'path': os.path.abspath(taf.path), 'hash': taf.hash,
+                        'duration': round(taf.duration, 3), 'chapters': len(taf.chapters), 'candidates': found})
+    db.close()
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'checked': len(tafs), 'unknown': len(unknown), 'min_confidence': FP_MIN_CONFIDENCE,
+                       'files': results}, f, indent=2, ensure_ascii=False)
+        print(f"📊 Bericht: {report_path}")
+    return results
+
+def verify_outputs(taf_files, catalog, journal, cache, jobs, trees=()):
+    """
+    --verify: prüft alle fertigen Ausgaben, ohne neu zu kodieren. Die Dauer jeder Ausgabe
+    (laut FFmpeg) muss zur Dauer laut OGG-Page-Index der TAF passen. Unvollständige Titel
+    verlieren ihren Journal-Eintrag und werden beim nächsten Lauf neu erzeugt.
+    Mit `trees` (--profile) wird jeder Profil-Ordner gegen sein eigenes Journal geprüft.
+    Gibt die Anzahl gefundener Probleme zurück.
+    """
+    print(f"🔎 Prüfe Ausgaben zu {len(taf_files)} TAF-Dateien...")
+    tafs = []
+    for path in taf_files:
+        taf = cache.get(path)[0] if cache else None
+        if taf is None or not taf.analyzed:
+            taf = analyze_taf(path)
+            if cache: cache.put_analysis(taf)
+        tafs.append(taf)
+    dups = find_duplicates(tafs)
+    tafs = [taf for i, taf in enumerate(tafs) if i not in dups]
+
+    targets = [(OUTPUT_DIR, catalog, journal, None)]
+    targets += [(tree.spec['dir'], tree.catalog, tree.journal, tree.spec['id']) for tree in trees]
+    totals = [0, 0, 0, 0, 0]  # geprüft, kaputt, veraltet, nicht konvertiert, Temp-Reste
+    for out_dir, tree_catalog, tree_journal, fmt_id in targets:
+        if trees: print(f"📂 {out_dir}")
+        for k, n in enumerate(_verify_dir(tafs, out_dir, tree_catalog, tree_journal, fmt_id, jobs)): totals[k] += n
+    checked, broken, stale, unconverted, parts = totals
+
+    print("-" * 60)
+    print(f"✅ {checked - broken} in Ordnung | ✗ {broken} neu zu erzeugen | ⚠️  {stale} veraltet | "
+          f"{unconverted} noch nicht konvertiert | {parts} Temp-Reste entfernt")
+    if broken: print("   Ein normaler Lauf erzeugt die fehlerhaften Titel neu.")
+    return broken + stale
+
+def _verify_dir(tafs, out_dir, catalog, journal, fmt_id, jobs):
+    """
+    Ausgaben eines Ordners (Haupt-Ausgabe oder Profil) prüfen. `fmt_id` = Journal-Format des
+    Profils, None = aus der Dateiendung (OUTPUT_FORMATS).
+    Gibt (geprüft, kaputt, veraltet, nicht konvertiert, Temp-Reste) zurück.
+    """
+    checks = []; unconverted = 0
+    for taf in tafs:
+        rec = journal.records.get(taf.hash) if taf.hash else None
+        entry = catalog.get(f"auto_{taf.hash[:10]}") if taf.hash else None
+        names = list(rec['files']) if rec else (entry or {}).get('playlistFileNames') or []
+        if not names: unconverted += 1; continue
+        checks.append((taf, [os.path.join(out_dir, n) for n in names], rec))
+    # FFmpeg liest nur Container/Header -> parallel in Threads
+    with ThreadPoolExecutor(max(1, jobs)) as ex:
+        results = list(ex.map(lambda c: outputs_complete(c[1], c[0].duration), checks))
+
+    broken = 0
+    for (taf, paths, rec), ok in zip(checks, results):
+        if ok:
+            if not rec:
+                # Ältere Ausgabe ohne Journal-Eintrag: geprüft, ab jetzt als fertig vermerkt
+                fmt = fmt_id or next((k for k, v in OUTPUT_FORMATS.items() if paths[0].endswith(v['ext'])), None)
+                if fmt: journal.record(taf.hash, os.path.basename(taf.path), fmt, paths, taf.duration)
+            continue
+        broken += 1
+        print(f"   ✗ {os.path.basename(paths[0])}: fehlt, unvollständig oder beschädigt ({os.path.basename(taf.path)})")
+        if rec: journal.drop(taf.hash)
+
+    # Journal-Einträge ohne passende TAF: Quelle gelöscht oder verändert -> Ausgabe veraltet
+    hashes = {taf.hash for taf in tafs}
+    stale = [rec for h, rec in journal.records.items() if h not in hashes]
+    for rec in stale: print(f"   ⚠️  {', '.join(rec['files'])}: Quelle {rec['taf']} fehlt oder wurde verändert")
+
+    # Reste abgebrochener Encodes
+    parts = glob.glob(os.path.join(out_dir, ".*.part.*"))
+    for path in parts:
+        try: os.remove(path)
+        except OSError: pass
+    return len(checks), broken, len(stale), unconverted, len(parts)
+
+def main(argv=None):
+    args = parse_args(argv)
+    jobs = max(1, args.jobs)
+    wait = (lambda msg: input(msg)) if not (args.no_wait or args.watch) else (lambda msg: None)
+
     print("=" * 60)
     print("   ULTIMATE TAF TO JUKEBOX (Scrape & Convert)")
     print("=" * 60)
     
+    taxonomy = args.taxonomy or os.path.join(SOURCE_DIR, TAXONOMY_FILE)
+    if args.taxonomy or os.path.exists(taxonomy):
+        try:
+            tagger = set_taxonomy(taxonomy)
+            print(f"🏷️  Taxonomie {os.path.basename(taxonomy)}: {len(tagger.categories)} Kategorien, {tagger.keywords} Keywords")
+        except Exception as e:
+            print(f"✗ Taxonomie {taxonomy} nicht lesbar: {e}")
+            wait("Enter..."); return 1
+    if args.retag:
+        catalog = Catalog(os.path.join(OUTPUT_DIR, "jukebox.json"))
+        stats = RunStats(args.events)
+        stats.begin("tags")
+        changed = retag_catalog(catalog, get_tagger(), stats)
+        stats.end("tags", len(catalog.entries))
+        if changed: catalog.save()
+        print(f"✅ {changed} von {len(catalog.entries)} Einträgen neu getaggt ({stats.summary()}).")
+        if args.report: stats.write_report(args.report)
+        stats.close()
+        wait("Enter zum Beenden..."); return 0
+    if args.merge:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        failed = merge_queue(args.merge, Catalog(os.path.join(OUTPUT_DIR, "jukebox.json")),
+                             RunJournal(os.path.join(OUTPUT_DIR, JOURNAL_FILE)))
+        wait("Enter zum Beenden..."); return 1 if failed else 0
+
     # 1. Dateien suchen
     taf_files = sorted(glob.glob(os.path.join(SOURCE_DIR, "*.taf")))
-    if not taf_files:
+    if not taf_files and not args.watch:
         print("✗ Keine .taf Dateien gefunden!")
-        input("Enter..."); return
+        wait("Enter..."); return
+    if not args.watch: jobs = min(jobs, len(taf_files))
+    if args.worker:
+        if args.watch or args.profile:
+            print("✗ --worker lässt sich nicht mit --watch oder --profile kombinieren.")
+            wait("Enter..."); return 1
+        args.no_cache = True  # SQLite-Cache nicht von mehreren Rechnern gleichzeitig beschreiben
+    try: specs = [make_profile(p) for p in args.profile]
+    except ValueError as e:
+        print(f"✗ {e}")
+        wait("Enter..."); return 1
+    stats = RunStats(args.events)
 
-    # 2. Datenbank laden (Hybrid)
-    raw_db = download_db()
-    if not raw_db:
-        print("   Suche lokale 'tonies.json'...", end=" ")
-        if os.path.exists(JSON_FILE):
-            with open(JSON_FILE, 'r', encoding='utf-8') as f: raw_db = json.load(f)
-            print("Gefunden ✓")
-        else:
-            print("Nicht gefunden ✗")
+    if args.verify_taf:
+        bad = verify_tafs(taf_files, jobs, args.report or os.path.join(SOURCE_DIR, TAF_VERIFY_REPORT), args.quarantine)
+        stats.close()
+        wait("Enter zum Beenden...")
+        return 1 if bad else 0
 
-    db = normalize_db(raw_db)
-    
-    # 3. Browser starten
-    browser = None; page = None
-    if PLAYWRIGHT_AVAILABLE:
-        print("🚀 Starte Browser für Detail-Daten...")
-        try:
-            p = sync_playwright().start()
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-        except Exception as e:
-            print(f"   (Browser Start fehlgeschlagen: {e})")
-            PLAYWRIGHT_AVAILABLE = False
+    # 2. Cache öffnen
+    cache = None
+    if not args.no_cache:
+        cache = AnalysisCache(os.path.join(SOURCE_DIR, CACHE_FILE))
+        if args.rebuild_cache:
+            print("♻️  Cache wird neu aufgebaut.")
+            cache.clear()
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    jukebox_entries = []
+    catalog_path = os.path.join(OUTPUT_DIR, "jukebox.json")
+    catalog = Catalog(catalog_path)
+    journal = RunJournal(os.path.join(OUTPUT_DIR, JOURNAL_FILE))
+    args.trees = [OutputTree(spec) for spec in specs]
+    for tree in args.trees:
+        print(f"🎚️  Profil {tree.spec['name']}: {' '.join(tree.spec['audio'])} -> {tree.spec['dir']}")
+    if args.rebuild_catalog:
+        print("♻️  Katalog wird neu aufgebaut (manuelle Einträge bleiben).")
+        catalog.drop_auto()
+        for tree in args.trees: tree.catalog.drop_auto()
 
-    # 4. Loop
-    for i, taf_path in enumerate(taf_files, 1):
-        filename = os.path.basename(taf_path)
-        print(f"\n[{i}/{len(taf_files)}] {filename}")
-        
-        file_hash = get_hash(taf_path)
-        meta = db.get(file_hash, {})
-        
-        # Basis Info
-        series = meta.get('series', '')
-        episode = meta.get('episode', '')
-        title = f"{series} - {episode}" if series and episode else (series or episode or "Unbekannt")
-        if title == "Unbekannt" and meta.get('title'): title = meta.get('title')
-        
-        orig_base = clean_filename(title)
-        if not orig_base: orig_base = os.path.splitext(filename)[0]
-        
-        # Scrape Missing Details
-        scraped = {}
-        if page and meta.get('web'):
-            # Wir scrapen, wenn wir keine gute Beschreibung haben
-            if not meta.get('description') or len(meta.get('description', '')) < 20:
-                print(f"   🔍 Hole Details von tonies.com...", end=" ")
-                scraped = scrape_full_description(page, meta.get('web'))
-                if scraped.get('description'): print("Beschreibung gefunden ✓")
-                else: print("-")
-        
-        # Daten konsolidieren
-        final_desc = scraped.get('description') or meta.get('description', '')
-        final_age = scraped.get('min_age') or meta.get('age') or 0
-        try: final_age = int(final_age)
-        except: final_age = 0
-        final_genre = scraped.get('genre') or "Hörspiel"
-        
-        # Meta Dictionary für Converter
-        convert_meta = {
-            'title': title, 'series': series, 'description': final_desc,
-            'age': final_age, 'genre': final_genre
-        }
-
-        # Pfade
-        mp3_path = os.path.join(OUTPUT_DIR, f"{orig_base}.mp3")
-        jpg_path = os.path.join(OUTPUT_DIR, f"{orig_base}.jpg")
-        cue_path = os.path.join(OUTPUT_DIR, f"{orig_base}.cue")
-        
-        # Cover laden
-        has_cover = False
-        if os.path.exists(jpg_path): has_cover = True
-        elif meta.get('image') or meta.get('pic'):
-            url = meta.get('image') or meta.get('pic')
-            if dl_cover(url, jpg_path): has_cover = True
-            
-        # Konvertierung
-        if not os.path.exists(mp3_path):
-            try:
-                with open(taf_path, "rb") as f:
-                    f.seek(HEADER_SIZE)
-                    audio_data = f.read()
-                convert_audio_with_progress(audio_data, mp3_path, convert_meta, jpg_path if has_cover else None)
-            except Exception as e: print(f"   ✗ Fehler: {e}")
-        else:
-            print("   -> MP3 existiert bereits.")
+    if args.match:
+        match_tafs(taf_files, args, cache, args.report or os.path.join(SOURCE_DIR, FP_MATCH_REPORT))
+        if cache: cache.close()
+        stats.close()
+        wait("Enter zum Beenden...")
+        return 0
 
-        # CUE Sheet
-        chapters = get_chapters_robust(taf_path)
-        if len(chapters) > 1:
-            try:
-                page_map = scan_ogg_timestamps(taf_path)
-                with open(cue_path, "w", encoding="utf-8") as f:
-                    f.write(f'REM CREATED BY TAF CONVERTER\nTITLE "{title}"\nFILE "{os.path.basename(mp3_path)}" MP3\n')
-                    track_list = meta.get('tracks') or meta.get('track-desc') or []
-                    for idx, ch in enumerate(chapters):
-                        ts = "00:00:00"
-                        if ch > 0 and (ch-1) in page_map: ts = granule_to_cue(page_map[ch-1])
-                        t_name = track_list[idx] if idx < len(track_list) else f"Kapitel {idx+1}"
-                        f.write(f'  TRACK {idx+1:02d} AUDIO\n    TITLE "{t_name}"\n    INDEX 01 {ts}\n')
-            except: pass
+    if args.verify:
+        problems = verify_outputs(taf_files, catalog, journal, cache, jobs, args.trees)
+        if cache: cache.close()
+        stats.close()
+        wait("Enter zum Beenden...")
+        return 1 if problems else 0
+
+    if args.worker:
+        done, failed, left = start_workers(args, jobs, catalog)
+        print("-" * 60)
+        print(f"✅ Queue: {done} fertig | ✗ {failed} fehlgeschlagen | {left} offen")
+        print(f"   Zusammenführen (einmal, wenn alle Worker fertig sind): --merge {args.worker}")
+        stats.close()
+        wait("Enter zum Beenden...")
+        return 1 if failed else 0
+
+    pool = manager = progress_queue = None
+    if jobs > 1: pool, manager, progress_queue = open_pool(jobs)
+    try:
+        if taf_files: process_files(taf_files, args, catalog, journal, cache, stats, pool, progress_queue, jobs)
+        # Bestehende Einträge behalten ihre Position, neue kommen in Dateireihenfolge dazu
+        catalog.save()
+        for tree in args.trees: tree.catalog.save()
+        if args.watch:
+            watch_folder(args, catalog_path, journal, cache, stats, pool, progress_queue, jobs, taf_files)
+            catalog = Catalog(catalog_path)
+    finally:
+        if pool:
+            pool.shutdown()
+            manager.shutdown()
+        if cache: cache.close()
 
-        # JUKEBOX ENTRY
-        tags = detect_tags(title, final_desc, final_genre)
-        entry = {
-            "tagId": f"auto_{file_hash[:10] if file_hash else 'unknown'}",
-            "name": title,
-            "playlistFileNames": [os.path.basename(mp3_path)],
-            "imageFileName": os.path.basename(jpg_path) if has_cover else None,
-            "meta": {
-                "description": final_desc,
-                "age_recommendation": final_age,
-                "genre": final_genre,
-                "series": series,
-                "runtime": meta.get('runtime', 0)
-            },
-            "filter_age": final_age,
-            "tags": tags
-        }
-        jukebox_entries.append(entry)
-
-    # Abschluss
-    if browser: browser.close()
-    
-    json_out = os.path.join(OUTPUT_DIR, "jukebox.json")
-    with open(json_out, 'w', encoding='utf-8') as f:
-        json.dump(jukebox_entries, f, indent=4, ensure_ascii=False)
-        
     print("-" * 60)
-    print(f"✅ Fertig! jukebox.json erstellt in: {OUTPUT_DIR}")
-    input("Enter zum Beenden...")
+    print(f"⏱️  {stats.summary()}")
+    if args.report:
+        stats.write_report(args.report)
+        print(f"📊 Laufzeitbericht: {args.report}")
+    stats.close()
+    print(f"✅ Fertig! jukebox.json ({len(catalog.entries)} Einträge) aktualisiert in: {OUTPUT_DIR}")
+    for tree in args.trees:
+        print(f"   Profil {tree.spec['name']}: {len(tree.catalog.entries)} Einträge in {tree.spec['dir']}")
+    wait("Enter zum Beenden...")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())